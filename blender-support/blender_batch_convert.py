@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+
+# Driver converting many 3D content files to glTF 2.0 Binary (*.glb), thanks to
+# a pool of long-lived Blender processes, each running blender_convert.py in
+# batch mode (so that Blender start-up costs are paid once per worker, not once
+# per file).
+#
+# Usage: blender_batch_convert.py [-j N] [--blender PATH] [--profile NAME]
+#          [--extra-output PROFILE[:SUFFIX]]... [--lods RATIOS]
+#          [--lod-budgets TRIANGLES] [--optimize] [--merge-by-material]
+#          FILE_OR_DIR...
+#
+# Directories are scanned recursively for content files of the supported
+# formats. If a cache directory is specified (see blender_cache.py), inputs
+# whose conversion is already cached are not sent to Blender. If a build
+# database is specified (see blender_build.py), only the inputs whose output is
+# out of date with respect to them or to their dependencies are converted.
+#
+# The status records of the conversions (including per-stage durations and
+# memory footprints) may be appended to a log (as JSON lines), and aggregated
+# in a report of the slowest assets and stages, from this run or from a log.
+#
+# Unlike blender_convert.py, this script is a plain Python one, not to be run
+# from within Blender.
+
+import sys
+import os
+import argparse
+import json
+import queue
+import subprocess
+import threading
+import time
+
+import blender_cache
+import blender_build
+import blender_snake
+
+
+# Extensions of the content files that blender_convert.py can import:
+supported_extensions = ('.gltf', '.dae', '.fbx', '.obj', '.ifc')
+
+# Must match the one defined in blender_convert.py:
+STATUS_PREFIX = "@@blender-convert-status "
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def collect_content_files(paths):
+    """Returns the (absolute) paths of the content files to convert, found from
+    the specified file or directory paths."""
+
+    content_files = []
+
+    for path in paths:
+
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for f in sorted(files):
+                    if os.path.splitext(f)[1].lower() in supported_extensions:
+                        content_files.append(os.path.abspath(os.path.join(root, f)))
+        else:
+            content_files.append(os.path.abspath(path))
+
+    return content_files
+
+
+
+class BlenderWorker:
+    """Drives a Blender process converting in batch mode the files that it is
+    given, one at a time."""
+
+    def __init__(self, blender_exec, convert_args=()):
+        # As Blender is run from the directory of this script:
+        if os.sep in blender_exec:
+            blender_exec = os.path.abspath(blender_exec)
+        self.blender_exec = blender_exec
+        # Command-line arguments for blender_convert.py:
+        self.convert_args = list(convert_args)
+        self.process = None
+
+
+    def start(self):
+        command = [ self.blender_exec, '--background', '--python',
+                    os.path.join(script_dir, 'blender_convert.py'), '--',
+                    '--batch' ] + self.convert_args
+        self.process = subprocess.Popen(command, cwd=script_dir,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT,
+                                        universal_newlines=True, bufsize=1)
+
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+
+    def convert(self, content_file):
+        """Requests the conversion of the specified file, and returns the
+        corresponding status dictionary; the process is restarted if it
+        died."""
+
+        if not self.is_alive():
+            self.start()
+
+        start = time.perf_counter()
+        output_lines = []
+
+        try:
+            self.process.stdin.write(content_file + '\n')
+            self.process.stdin.flush()
+
+            for line in self.process.stdout:
+                if line.startswith(STATUS_PREFIX):
+                    return json.loads(line[len(STATUS_PREFIX):])
+                output_lines.append(line)
+
+        except (BrokenPipeError, ValueError):
+            pass
+
+        # Here the process died (e.g. crashed) before reporting a status:
+        self.stop()
+
+        return { "input": content_file, "status": "error",
+                 "error": "Blender process terminated unexpectedly: %s" % ''.join(output_lines[-5:]).strip(),
+                 "duration": time.perf_counter() - start }
+
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            # An empty line makes the batch loop terminate:
+            if self.process.poll() is None:
+                self.process.stdin.write('\n')
+                self.process.stdin.close()
+                self.process.wait(timeout=30)
+        except (BrokenPipeError, ValueError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+
+def get_output_settings(profile_name=blender_snake.default_export_profile,
+                        extra_output_specs=(), lod_levels=(), optimize=False,
+                        merge_by_material=False):
+    """Returns the output settings of conversions, as blender_convert.py
+    describes them."""
+
+    return { "profile": profile_name,
+             "extra_outputs": list(extra_output_specs),
+             "lods": list(lod_levels),
+             "optimize": optimize or merge_by_material,
+             "merge_by_material": merge_by_material }
+
+
+
+def get_convert_args(output_settings):
+    """Returns the command-line arguments of blender_convert.py corresponding
+    to the specified output settings."""
+
+    convert_args = [ '--profile', output_settings["profile"] ]
+
+    for output_spec in output_settings["extra_outputs"]:
+        convert_args += [ '--extra-output', output_spec ]
+
+    lod_levels = output_settings["lods"]
+
+    if lod_levels:
+        convert_args += [ '--lods', ','.join(str(level["ratio"]) for level in lod_levels) ]
+        if lod_levels[0]["budget"] is not None:
+            convert_args += [ '--lod-budgets', ','.join(str(level["budget"]) for level in lod_levels) ]
+
+    if output_settings["merge_by_material"]:
+        convert_args.append('--merge-by-material')
+    elif output_settings["optimize"]:
+        convert_args.append('--optimize')
+
+    return convert_args
+
+
+
+def get_outputs(content_file, output_settings):
+    """Returns the (target file, profile name, cache variant) triplets of the
+    outputs of the conversion of the specified content file, in the order in
+    which blender_convert.py lists them."""
+
+    profile_name = output_settings["profile"]
+
+    # Affecting all outputs:
+    scene_settings = { "optimize": output_settings["optimize"],
+                       "merge_by_material": output_settings["merge_by_material"] }
+
+    outputs = [ (target_file, output_profile, scene_settings)
+                for target_file, output_profile in blender_snake.get_output_files(
+                    content_file, profile_name, output_settings["extra_outputs"]) ]
+
+    lod_levels = output_settings["lods"]
+
+    if lod_levels:
+
+        lod_files, manifest_file = blender_snake.get_lod_files(content_file, lod_levels)
+
+        for i, lod_file in enumerate(lod_files, 1):
+            outputs.append((lod_file, profile_name,
+                            dict(scene_settings, lods=lod_levels, level=i)))
+
+        # The manifest lists file names:
+        outputs.append((manifest_file, profile_name,
+                        dict(scene_settings, lods=lod_levels,
+                             manifest=os.path.basename(content_file))))
+
+    return outputs
+
+
+
+def convert_all(content_files, blender_exec='blender', jobs=1, report=None,
+                cache=None, build_db=None, output_settings=None):
+    """Converts the specified content files thanks to 'jobs' Blender processes,
+    with the specified output settings (see get_output_settings), and returns
+    the list of their status dictionaries (in completion order);
+    'report', if set, is called with each status as soon as it is known.
+
+    Content files that do not exist or whose format is not recognised are
+    rejected without being sent to Blender.
+
+    If a ConversionCache is specified, the cached conversions are reused, and
+    the new ones are stored in it.
+
+    If a BuildDatabase is specified, only the out-of-date content files are
+    converted, and the dependencies of the conversions are recorded in it (the
+    caller having to save it afterwards)."""
+
+    if output_settings is None:
+        output_settings = get_output_settings()
+
+    statuses = []
+    lock = threading.Lock()
+
+    file_queue = queue.Queue()
+    keys = {}
+
+    # Determined only if needed, as requiring to launch Blender:
+    blender_version = None
+
+    def record(content_file, status):
+        # Expected to be called with the lock held, or before threads start.
+        if build_db is None:
+            return
+        if status["status"] == "error":
+            build_db.forget(content_file)
+            return
+        dependencies = status.get("dependencies")
+        if dependencies is None:
+            # No information from Blender (ex: cached conversion):
+            content_format = blender_snake.get_format(content_file, warn=False)
+            dependencies = set(blender_snake.get_static_dependencies(content_file, content_format))
+            dependencies.update(build_db.get_dependencies(content_file))
+        # Any change of the output settings shall trigger new conversions:
+        build_db.record(content_file, status["outputs"], dependencies, output_settings)
+
+    def add_status(status):
+        statuses.append(status)
+        if report:
+            report(status)
+
+    for f in content_files:
+
+        if not os.path.isfile(f):
+            add_status({ "input": f, "status": "error", "duration": 0.0,
+                         "error": "content file not found" })
+            continue
+
+        if blender_snake.get_format(f) == blender_snake.ContentFormat.UNKNOWN:
+            add_status({ "input": f, "status": "error", "duration": 0.0,
+                         "error": "content format not recognised" })
+            continue
+
+        outputs = get_outputs(f, output_settings)
+        target_files = [ target_file for target_file, _, _ in outputs ]
+
+        if build_db is not None and build_db.is_up_to_date(f, output_settings):
+            add_status({ "input": f, "output": target_files[0],
+                         "outputs": target_files, "status": "up-to-date",
+                         "duration": 0.0 })
+            continue
+
+        if cache is not None:
+
+            if blender_version is None:
+                blender_version = blender_cache.get_blender_version(blender_exec)
+
+            # The side files that only Blender could determine (ex: textures
+            # found by image search) are known from any previous conversion;
+            # otherwise a change of them would not be noticed by the cache:
+            #
+            recorded_dependencies = build_db.get_dependencies(f) if build_db is not None else ()
+
+            input_description = blender_cache.describe_input(f, recorded_dependencies)
+
+            # One entry per output, as depending only on its own profile (and
+            # variant):
+            #
+            keys[f] = [ (blender_cache.compute_key(f, blender_version, output_profile,
+                                                   variant, input_description), target_file)
+                        for target_file, output_profile, variant in outputs ]
+
+            if all(cache.lookup(key, target_file) for key, target_file in keys[f]):
+                status = { "input": f, "output": target_files[0],
+                           "outputs": target_files, "status": "cached",
+                           "duration": 0.0 }
+                record(f, status)
+                add_status(status)
+                continue
+
+        file_queue.put(f)
+
+    if file_queue.empty():
+        return statuses
+
+    def work():
+        worker = BlenderWorker(blender_exec, get_convert_args(output_settings))
+        try:
+            while True:
+                try:
+                    content_file = file_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    status = worker.convert(content_file)
+                except OSError as e:
+                    # Typically the Blender executable could not be found:
+                    status = { "input": content_file, "status": "error",
+                               "error": str(e), "duration": 0.0 }
+                if status["status"] == "ok" and content_file in keys:
+                    for key, target_file in keys[content_file]:
+                        cache.store(key, target_file)
+                with lock:
+                    record(content_file, status)
+                    add_status(status)
+        finally:
+            worker.stop()
+
+    threads = [ threading.Thread(target=work)
+                for _ in range(max(1, min(jobs, file_queue.qsize()))) ]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    return statuses
+
+
+
+def print_status(status):
+    if status["status"] == "ok":
+        print("[ok]     %s -> %s (%.2f s)" % (status["input"], status.get("output"), status["duration"]), flush=True)
+    elif status["status"] == "up-to-date":
+        print("[up-to-date] %s" % (status["input"],), flush=True)
+    elif status["status"] == "cached":
+        print("[cached] %s -> %s" % (status["input"], status.get("output")), flush=True)
+    else:
+        print("[error]  %s: %s" % (status["input"], status.get("error")), flush=True)
+
+
+
+def format_size(size):
+    """Returns a human-readable form of the specified size, in bytes."""
+
+    if size is None:
+        return "n/a"
+
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return "%.1f %s" % (size, unit)
+        size /= 1024
+
+    return "%.1f TiB" % (size,)
+
+
+
+def load_profile_records(log_path):
+    """Returns the status records stored in the specified log."""
+
+    with open(log_path, encoding='utf-8') as f:
+        return [ json.loads(line) for line in f if line.strip() ]
+
+
+
+def print_report(records, top=10):
+    """Prints the slowest assets and stages among the specified status records
+    (only the ones of actual conversions are taken into account)."""
+
+    records = [ r for r in records if r.get("stages") ]
+
+    if not records:
+        print("No conversion to report.")
+        return
+
+    print("\nSlowest assets:")
+
+    for r in sorted(records, key=lambda r: r["duration"], reverse=True)[:top]:
+        stats = r.get("statistics") or {}
+        print("  %8.2f s  %s (%s, %s objects, %s meshes, %s vertices, %s materials, peak RSS: %s)" % (
+            r["duration"], r["input"], r.get("format", "?"),
+            stats.get("objects", "?"), stats.get("meshes", "?"),
+            stats.get("vertices", "?"), stats.get("materials", "?"),
+            format_size(r.get("peak_rss"))))
+
+    # Per stage: list of (duration, record, stage) triplets.
+    stage_runs = {}
+
+    for r in records:
+        for stage in r["stages"]:
+            stage_runs.setdefault(stage["stage"], []).append((stage["duration"], r, stage))
+
+    print("\nSlowest stages (over %d conversions):" % (len(records),))
+
+    for name, runs in sorted(stage_runs.items(), key=lambda item: sum(d for d, _, _ in item[1]), reverse=True):
+        total = sum(d for d, _, _ in runs)
+        duration, r, stage = max(runs, key=lambda run: run[0])
+        growths = [ st["rss_growth"] for _, _, st in runs if st.get("rss_growth") is not None ]
+        print("  %-8s total: %8.2f s, mean: %7.2f s, max: %7.2f s (%s), max RSS growth: %s" % (
+            name, total, total / len(runs), duration, r["input"],
+            format_size(max(growths) if growths else None)))
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Converts 3D content files to glTF 2.0 Binary, thanks to a pool of Blender processes.')
+    parser.add_argument('paths', nargs='*', metavar='FILE_OR_DIR',
+                        help='content files, or directories to scan for them')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='number of Blender processes to run in parallel')
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'),
+                        help='Blender executable to use (default: $BLENDER, otherwise blender)')
+    parser.add_argument('--profile', choices=sorted(blender_snake.export_profiles),
+                        default=blender_snake.default_export_profile,
+                        help='export profile to apply (default: %(default)s)')
+    parser.add_argument('--extra-output', action='append', default=[], metavar='PROFILE[:SUFFIX]',
+                        help='exports, from the same import, an extra output with the specified profile (default suffix: .PROFILE.glb); may be repeated')
+    parser.add_argument('--lods', metavar='RATIOS',
+                        help='exports also levels of detail, decimated according to these comma-separated ratios (ex: 0.5,0.1), with a manifest')
+    parser.add_argument('--lod-budgets', metavar='TRIANGLES',
+                        help='comma-separated triangle budgets of the levels of detail (ex: 500000,100000)')
+    parser.add_argument('--optimize', action='store_true',
+                        help='turns identical meshes into instances and removes empty objects before exporting')
+    parser.add_argument('--merge-by-material', action='store_true',
+                        help='like --optimize, and merges static objects by material')
+    parser.add_argument('--cache-dir', default=os.environ.get('BLENDER_CONVERT_CACHE'),
+                        help='directory of the conversion cache (default: $BLENDER_CONVERT_CACHE, otherwise no cache)')
+    parser.add_argument('--cache-size', type=int, default=blender_cache.default_max_size // (1024 * 1024),
+                        help='maximum size of the conversion cache, in MiB')
+    parser.add_argument('--build-db', metavar='FILE',
+                        help='build database, to convert only the content files that are out of date')
+    parser.add_argument('--profile-log', metavar='FILE',
+                        help='log to which the status records of the conversions are appended, as JSON lines')
+    parser.add_argument('--report', type=int, nargs='?', const=10, metavar='N',
+                        help='reports the N (default: 10) slowest assets, and the slowest stages')
+    parser.add_argument('--report-from', metavar='FILE',
+                        help='only reports on the records of the specified log (no conversion done)')
+    args = parser.parse_args()
+
+    for output_spec in args.extra_output:
+        blender_snake.parse_output_spec(output_spec)
+
+    output_settings = get_output_settings(args.profile, args.extra_output,
+        blender_snake.parse_lod_levels(args.lods, args.lod_budgets),
+        args.optimize, args.merge_by_material)
+
+    if args.report_from:
+        print_report(load_profile_records(args.report_from), args.report or 10)
+        return
+
+    if not args.paths:
+        parser.error("at least one content file or directory is expected")
+
+    content_files = collect_content_files(args.paths)
+
+    if not content_files:
+        sys.exit("Error, no content file to convert found.")
+
+    print("Converting %d content files with up to %d Blender processes..." % (len(content_files), min(args.jobs, len(content_files))), flush=True)
+
+    start = time.perf_counter()
+
+    cache = None
+    if args.cache_dir:
+        cache = blender_cache.ConversionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    build_db = None
+    if args.build_db:
+        build_db = blender_build.BuildDatabase(args.build_db)
+
+    profile_log = None
+    if args.profile_log:
+        profile_log = open(args.profile_log, 'a', encoding='utf-8')
+
+    def report(status):
+        print_status(status)
+        if profile_log and status.get("stages") is not None:
+            profile_log.write(json.dumps(status) + '\n')
+            profile_log.flush()
+
+    try:
+        statuses = convert_all(content_files, args.blender, args.jobs,
+                               report, cache, build_db, output_settings)
+    finally:
+        if build_db is not None:
+            build_db.save()
+        if profile_log:
+            profile_log.close()
+
+    failures = [ s for s in statuses if s["status"] == "error" ]
+    cached_count = sum(1 for s in statuses if s["status"] == "cached")
+    up_to_date_count = sum(1 for s in statuses if s["status"] == "up-to-date")
+
+    print("%d files converted (%d from cache), %d up to date, %d failed, in %.2f seconds." % (len(statuses) - len(failures) - up_to_date_count, cached_count, up_to_date_count, len(failures), time.perf_counter() - start))
+
+    for s in failures:
+        print("  failed: %s" % s["input"])
+
+    if args.report:
+        print_report(statuses, args.report)
+
+    if failures:
+        sys.exit(1)
+
+
+
+if __name__ == "__main__":
+    main()
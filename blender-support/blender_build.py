@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+# Incremental, make-like, build of the conversions done by blender_convert.py.
+#
+# A build database (a JSON file) records, for each converted content file, its
+# outputs and the files that the conversion depended on (the content file
+# itself, and its side files: textures, OBJ material libraries, glTF external
+# buffers, etc.), together with their stamps (modification time and size) at
+# conversion time. A content file is then to be converted again only if its
+# outputs are missing, if any of these files changed (or disappeared) since, or
+# if it is now to be converted with other settings (ex: export profile).
+#
+# Unlike blender_snake.py, this module does not require Blender (bpy).
+
+import os
+import json
+
+
+def get_stamp(path):
+    """Returns the stamp of the specified file (None if it does not exist)."""
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return [ stat.st_mtime_ns, stat.st_size ]
+
+
+
+class BuildDatabase:
+    """Records the dependencies of the conversions, and tells which ones are
+    out of date."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.entries = {}
+        if os.path.isfile(db_path):
+            with open(db_path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+
+    def is_up_to_date(self, content_file, settings=None):
+        """Tells whether the outputs of the specified content file are up to
+        date with respect to all its recorded dependencies and to the
+        specified conversion settings."""
+
+        entry = self.entries.get(content_file)
+
+        if entry is None or not entry.get('outputs'):
+            return False
+
+        if not all(os.path.isfile(o) for o in entry['outputs']):
+            return False
+
+        if entry.get('settings') != settings:
+            return False
+
+        for path, stamp in entry['stamps'].items():
+            if get_stamp(path) != stamp:
+                return False
+
+        return True
+
+
+    def get_dependencies(self, content_file):
+        """Returns the recorded side files of the specified content file."""
+        entry = self.entries.get(content_file)
+        if entry is None:
+            return []
+        return [ d for d in entry['stamps'] if d != content_file ]
+
+
+    def record(self, content_file, output_files, dependencies, settings=None):
+        """Records that the specified content file has just been converted in
+        the specified output files, based on the specified side files and
+        conversion settings."""
+
+        stamps = { path: get_stamp(path)
+                   for path in [ content_file ] + sorted(dependencies) }
+
+        self.entries[content_file] = { 'outputs': list(output_files),
+                                       'stamps': stamps,
+                                       'settings': settings }
+
+
+    def forget(self, content_file):
+        self.entries.pop(content_file, None)
+
+
+    def save(self):
+        """Writes the database (atomically) to its file."""
+
+        temp_path = self.db_path + '.tmp'
+
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+
+        os.replace(temp_path, self.db_path)
+
+
+
+if __name__ == "__main__":
+    print("This module is not meant to be executed directly; see blender_batch_convert.py.")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# Content-addressed cache of the conversions done by blender_convert.py, so
+# that converting again an unchanged input does not require launching Blender.
+#
+# The key of an entry is derived from the content (not the path nor the
+# timestamp) of the input file and of the side files that it references, its
+# detected format, the export profile and settings, and the version of Blender;
+# its value is the corresponding .glb file, stored in the cache directory and
+# copied (reflinked whenever the filesystem allows it) to its target path on
+# hits.
+#
+# The cache is bounded in size (least recently used entries being evicted
+# first) and checks the integrity of any entry before serving it.
+#
+# Unlike blender_snake.py, this module does not require Blender (bpy).
+
+import sys
+import os
+import hashlib
+import json
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+
+import blender_snake
+from blender_snake import ContentFormat
+
+
+# Default maximum total size of the cached files, in bytes:
+default_max_size = 2 * 1024 * 1024 * 1024
+
+# Size of the blocks in which files are hashed:
+hash_block_size = 1024 * 1024
+
+# From linux/fs.h, to share the extents of a file (copy-on-write clone):
+FICLONE = 0x40049409
+
+
+def get_file_digest(path):
+    """Returns the (hexadecimal) SHA256 digest of the content of the specified
+    file."""
+
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(hash_block_size)
+            if not block:
+                break
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+
+def get_blender_version(blender_exec='blender'):
+    """Returns the version string (ex: 'Blender 4.4.3') of the specified
+    Blender executable."""
+
+    output = subprocess.run([blender_exec, '--version'], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, universal_newlines=True,
+                            check=True).stdout
+
+    for line in output.splitlines():
+        if line.startswith('Blender'):
+            return line.strip()
+
+    return output.strip()
+
+
+
+def describe_input(content_file, extra_dependencies=()):
+    """Returns a description of the content of the specified content file and
+    of its side files (the ones it references by itself, plus the specified
+    extra ones, ex: the textures that Blender found by searching for them in a
+    previous conversion), to be part of cache keys."""
+
+    content_format = blender_snake.get_format(content_file, warn=False)
+
+    dependencies = set(blender_snake.get_static_dependencies(content_file, content_format))
+    dependencies.update(os.path.normpath(os.path.abspath(d)) for d in extra_dependencies)
+
+    # Relative to the input, so that a moved asset tree keeps its entries:
+    base_dir = os.path.dirname(os.path.abspath(content_file))
+
+    # Missing side files are described as well, as their removal may change
+    # the conversion:
+    #
+    dependency_digests = { os.path.relpath(d, base_dir): get_file_digest(d) if os.path.isfile(d) else None
+                           for d in sorted(dependencies) }
+
+    return { 'input': get_file_digest(content_file),
+             'dependencies': dependency_digests,
+             'format': ContentFormat.to_string(content_format) }
+
+
+
+def compute_key(content_file, blender_version,
+                profile_name=blender_snake.default_export_profile,
+                variant=None, input_description=None):
+    """Returns the cache key corresponding to the conversion of the specified
+    content file with the specified export profile; a variant may tell apart
+    different outputs of a same conversion (ex: levels of detail), and the
+    description of the input may be specified if already known."""
+
+    if input_description is None:
+        input_description = describe_input(content_file)
+
+    key_data = json.dumps({ 'input': input_description,
+                            'settings': blender_snake.gltf_export_settings,
+                            'profile': blender_snake.get_export_profile(profile_name),
+                            'variant': variant,
+                            'blender': blender_version },
+                          sort_keys=True)
+
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+
+def copy_file(source, target):
+    """Copies the specified file, as a reflink (sharing its data blocks) if
+    possible, otherwise as a regular copy."""
+
+    try:
+        import fcntl
+        with open(source, 'rb') as f_in:
+            with open(target, 'wb') as f_out:
+                fcntl.ioctl(f_out.fileno(), FICLONE, f_in.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+
+    shutil.copyfile(source, target)
+
+
+
+class ConversionCache:
+    """Stores the results of conversions, indexed in an SQLite database, in
+    the specified directory. May be shared between threads."""
+
+    def __init__(self, cache_dir, max_size=default_max_size, verify=True):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.verify = verify
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cache_dir, 'index.db'),
+                                          check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, digest TEXT, last_access REAL)')
+        self.connection.commit()
+
+
+    def get_entry_path(self, key):
+        return os.path.join(self.cache_dir, 'objects', key[:2], key + '.glb')
+
+
+    def lookup(self, key, target_file):
+        """Copies the cached result for the specified key to the target file,
+        and returns whether there was such a (valid) result."""
+
+        with self.lock:
+
+            row = self.connection.execute('SELECT size, digest FROM entries WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                return False
+
+            size, digest = row
+            entry_path = self.get_entry_path(key)
+
+            if not self.is_valid(entry_path, size, digest):
+                print("Warning: dropping corrupted cache entry '%s'." % (entry_path,), file=sys.stderr)
+                self.remove_entry(key)
+                self.connection.commit()
+                return False
+
+            copy_file(entry_path, target_file)
+
+            self.connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+            self.connection.commit()
+
+            return True
+
+
+    def is_valid(self, entry_path, size, digest):
+        try:
+            if os.path.getsize(entry_path) != size:
+                return False
+        except OSError:
+            return False
+        return not self.verify or get_file_digest(entry_path) == digest
+
+
+    def store(self, key, produced_file):
+        """Records the specified produced file as the result for the specified
+        key, then evicts entries as needed."""
+
+        entry_path = self.get_entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        # Atomic, so that no partial entry may be found:
+        temp_path = '%s.%d.%d.tmp' % (entry_path, os.getpid(), threading.get_ident())
+        copy_file(produced_file, temp_path)
+        digest = get_file_digest(temp_path)
+        os.replace(temp_path, entry_path)
+
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                                    (key, os.path.getsize(entry_path), digest, time.time()))
+            self.evict()
+            self.connection.commit()
+
+
+    def evict(self):
+        """Removes the least recently used entries until the total size of the
+        cache fits in its maximum size."""
+
+        total_size = self.get_total_size()
+
+        while total_size > self.max_size:
+            key, size = self.connection.execute('SELECT key, size FROM entries ORDER BY last_access LIMIT 1').fetchone()
+            self.remove_entry(key)
+            total_size -= size
+
+
+    def remove_entry(self, key):
+        self.connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self.get_entry_path(key))
+        except FileNotFoundError:
+            pass
+
+
+    def get_total_size(self):
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+
+    def get_entry_count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+    def close(self):
+        self.connection.close()
+
+
+
+if __name__ == "__main__":
+    print("This module is not meant to be executed directly; see blender_batch_convert.py.")
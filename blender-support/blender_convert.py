@@ -20,6 +20,43 @@
 # Refer to http://hull.esperide.org/#blender for further information.
 #
 # So no need to hack around with PYTHONPATH, pip, etc. to secure bpy, _bpy, etc.
+#
+# Once a content file has been converted (or failed to), a status line
+# (prefixed with STATUS_PREFIX, followed by a JSON object) is output; it
+# includes the duration and memory footprint of each stage of the conversion,
+# and counts describing the imported content.
+#
+# Batch mode: if run as:
+#
+# $(BLENDER) --background --python blender_convert.py -- --batch
+#
+# the paths of the content files to convert are read from the standard input,
+# one per line, so that a single Blender instance converts many files in turn
+# (see blender_batch_convert.py).
+#
+# In both modes, an export profile (see blender_snake.export_profiles; ex:
+# 'web-small', 'archive', 'preview') may be selected, as in:
+#
+# $(BLENDER) --python blender_convert.py -- --profile web-small "$(MY_CONTENT_FILE)"
+#
+# Extra outputs, exported from the same import, may be requested as well, each
+# as PROFILE[:SUFFIX] (the default suffix being '.PROFILE.glb'), as in:
+#
+# $(BLENDER) --python blender_convert.py -- --extra-output preview:-lod.glb "$(MY_CONTENT_FILE)"
+#
+# A chain of levels of detail may also be produced from the same import,
+# decimated according to ratios and/or triangle budgets (from the finest level
+# to the coarsest one), together with a manifest listing them (ex: for a
+# "$(MY_CONTENT_FILE)" of foo.ifc: foo.lod1.glb, foo.lod2.glb and
+# foo.lods.json, LOD 0 being foo.glb; ratios apply on top of any decimation
+# of the export profile), as in:
+#
+# $(BLENDER) --python blender_convert.py -- --lods 0.5,0.1 --lod-budgets 500000,100000 "$(MY_CONTENT_FILE)"
+#
+# The imported content may be optimised before being exported (identical meshes
+# becoming linked instances, empty objects being removed) with --optimize, and
+# its static objects may additionally be merged by material with
+# --merge-by-material.
 
 # IFC prerequisite: the BIM add-on must have already been installed in Blender,
 # see https://blenderbim.org/.
@@ -28,6 +65,8 @@ import bpy
 
 import sys
 import os.path
+import json
+import time
 
 
 # Needing to find our blender_snake helper module:
@@ -45,21 +84,48 @@ from blender_snake import ContentFormat
 
 # blenderbim imports made only if/when necessary.
 
-content_file = sys.argv[-1]
+batch_opt = "--batch"
+profile_opt = "--profile"
+extra_output_opt = "--extra-output"
+lods_opt = "--lods"
+lod_budgets_opt = "--lod-budgets"
+optimize_opt = "--optimize"
+merge_opt = "--merge-by-material"
 
+# Prefix of the status lines:
+STATUS_PREFIX = "@@blender-convert-status "
 
 
 
-# Main program:
+def get_option_value(option, default):
+    """Returns the value following the specified option on the command line,
+    otherwise the specified default one."""
 
+    if option in sys.argv:
+        index = sys.argv.index(option)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+
+    return default
 
-# To stop on error, using 'sys.exit(Str)' as 'raise Exception(...' would not
-# be sufficient.
 
 
-if os.path.isfile(content_file):
+def get_option_values(option):
+    """Returns the values following each occurrence of the specified option on
+    the command line."""
 
-    blender_snake.setup_blender_blank_state()
+    return [ sys.argv[i + 1] for i, arg in enumerate(sys.argv[:-1])
+             if arg == option ]
+
+
+
+def convert(content_file, profiler, output_settings):
+    """Converts the specified content file, with the specified StageProfiler
+    and output settings (export profile, extra outputs and levels of detail);
+    returns the paths of the target files (the main one first)."""
+
+    with profiler.stage("setup"):
+        blender_snake.setup_blender_blank_state()
 
     detected_format = blender_snake.get_format(content_file)
 
@@ -68,17 +134,125 @@ if os.path.isfile(content_file):
 
     print("### Requesting Blender to import the content in file '" + content_file + "', detected as being in the %s format..." % (ContentFormat.to_string(detected_format)))
 
-    blender_snake.import_content(content_file, detected_format)
+    with profiler.stage("import"):
+        blender_snake.import_content(content_file, detected_format)
+
+    profiler.record_statistics()
+
+    if output_settings["optimize"]:
+        with profiler.stage("optimize"):
+            profiler.details["optimization"] = blender_snake.optimize_scene(output_settings["merge_by_material"])
+
+    profile_name = output_settings["profile"]
+
+    outputs = blender_snake.get_output_files(content_file, profile_name, output_settings["extra_outputs"])
+
+    for i, (target_file, output_profile) in enumerate(outputs):
+
+        print("### Exporting the content in target file '" + target_file + "' as (binary) gltTF 2.0, with the '%s' profile" % (output_profile,))
+
+        stage_name = "export" if i == 0 else "export (%s)" % (output_profile,)
+
+        with profiler.stage(stage_name):
+            blender_snake.export_content(target_file, ContentFormat.GLTF, output_profile)
+
+        print("The file '%s' has been successfully generated from '%s', in '%s'." % (os.path.basename(target_file), os.path.basename(content_file), os.path.dirname(content_file)))
+
+    target_files = [ target_file for target_file, _ in outputs ]
+
+    if output_settings["lods"]:
+        with profiler.stage("lods"):
+            target_files += blender_snake.export_lods(content_file, output_settings["lods"], profile_name)
 
-    content_basename = os.path.splitext(content_file)[0]
+    return target_files
 
-    target_file = content_basename + ".glb"
 
-    print("### Exporting the content in target file '" + target_file + "' as (binary) gltTF 2.0")
 
-    blender_snake.export_content(target_file, ContentFormat.GLTF)
+def convert_and_report(content_file, output_settings):
+    """Converts the specified content file with the specified output settings,
+    outputs the corresponding status line, and returns that status."""
 
-    print("The file '%s' has been successfully generated from '%s', in '%s'." % (os.path.basename(target_file), os.path.basename(content_file), os.path.dirname(content_file)))
+    status = { "input": content_file,
+               "format": ContentFormat.to_string(blender_snake.get_format(content_file, warn=False)),
+               "profile": output_settings["profile"] }
+
+    profiler = blender_snake.StageProfiler()
+    start = time.perf_counter()
+
+    # Errors are reported by the helpers through sys.exit:
+    try:
+        if not os.path.isfile(content_file):
+            sys.exit("Error, specified content file '" + content_file + "' to convert could not be found.")
+        status["outputs"] = convert(content_file, profiler, output_settings)
+        status["output"] = status["outputs"][0]
+        status["status"] = "ok"
+        # Files whose change shall trigger a new conversion:
+        dependencies = blender_snake.get_static_dependencies(content_file, blender_snake.get_format(content_file, warn=False))
+        dependencies += blender_snake.get_image_dependencies()
+        status["dependencies"] = sorted(set(d for d in dependencies if os.path.isfile(d)))
+    except SystemExit as e:
+        status["status"] = "error"
+        status["error"] = str(e.code)
+    except Exception as e:
+        status["status"] = "error"
+        status["error"] = "%s: %s" % (type(e).__name__, e)
+
+    status["duration"] = time.perf_counter() - start
+    status.update(profiler.to_dict())
+
+    print(STATUS_PREFIX + json.dumps(status), flush=True)
+
+    return status
+
+
+
+def convert_batch(output_settings):
+    """Converts in turn, with the specified output settings, the content files
+    whose paths are read from the standard input, reporting a status line for
+    each of them, and going on after failures."""
+
+    for line in sys.stdin:
+
+        content_file = line.strip()
+
+        if not content_file:
+            break
+
+        convert_and_report(content_file, output_settings)
+
+
+
+# Main program:
+
+
+# To stop on error, using 'sys.exit(Str)' as 'raise Exception(...' would not
+# be sufficient.
+
+
+export_profile = get_option_value(profile_opt, blender_snake.default_export_profile)
+
+extra_outputs = get_option_values(extra_output_opt)
+
+# Checked once for all:
+blender_snake.get_export_profile(export_profile)
+
+for output_spec in extra_outputs:
+    blender_snake.parse_output_spec(output_spec)
+
+output_settings = { "profile": export_profile,
+                    "extra_outputs": extra_outputs,
+                    "lods": blender_snake.parse_lod_levels(get_option_value(lods_opt, None),
+                                                           get_option_value(lod_budgets_opt, None)),
+                    "optimize": optimize_opt in sys.argv or merge_opt in sys.argv,
+                    "merge_by_material": merge_opt in sys.argv }
+
+if batch_opt in sys.argv:
+
+    convert_batch(output_settings)
 
 else:
-    sys.exit("Error, specified content file '" + content_file + "' to convert could not be found.")
+
+    status = convert_and_report(sys.argv[-1], output_settings)
+
+    if status["status"] == "error":
+        sys.exit(status["error"])
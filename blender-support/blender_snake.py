@@ -3,13 +3,34 @@
 # A Ceylan-Snake module centralising common facilities for various other
 # import/conversion scripts.
 
-import bpy
+# Tolerated to be missing, so that the helpers not relying on Blender (ex:
+# ContentFormat, get_format) can be used from plain Python scripts as well (ex:
+# blender_batch_convert.py, blender_cache.py):
+#
+try:
+    import bpy
+except ImportError:
+    bpy = None
 
 import sys
 import os.path
 
 import importlib.util
 
+import json
+import time
+import urllib.parse
+import hashlib
+import array
+
+from contextlib import contextmanager
+
+# Not available on all platforms (ex: Windows):
+try:
+    import resource
+except ImportError:
+    resource = None
+
 # No to be done here, is imported conditionally (iff relevant, i.e. if having an
 # IFC file):
 #
@@ -57,8 +78,91 @@ class ContentFormat(Enum):
 
 
 
+# Settings of the glTF exporter common to all export profiles:
+gltf_export_settings = { 'export_format': 'GLB' }
+
+
+# Named export profiles (see export_content), each made of:
+#  - 'gltf_settings': settings of the glTF exporter, overriding the common ones
+#  - 'max_texture_size': if set, the images larger than that (in pixels, on
+#    either dimension) are downscaled before being exported
+#  - 'decimate_ratio': if set, the meshes are decimated (collapse) to keep this
+#    ratio of their faces
+#
+# Profiles are part of the keys of the conversion cache (see blender_cache.py),
+# so that a change thereof invalidates its entries.
+#
+# Refer to
+# https://docs.blender.org/api/current/bpy.ops.export_scene.html#bpy.ops.export_scene.gltf
+# for the exporter settings; those not supported by the Blender version at hand
+# are ignored (with a warning).
+#
+export_profiles = {
+
+    # Exporter defaults:
+    'default': { 'gltf_settings': {},
+                 'max_texture_size': None,
+                 'decimate_ratio': None },
+
+    # For web viewers: Draco compression, quantized attributes, WebP textures:
+    'web-small': { 'gltf_settings': {
+                       'export_draco_mesh_compression_enable': True,
+                       'export_draco_mesh_compression_level': 6,
+                       'export_draco_position_quantization': 14,
+                       'export_draco_normal_quantization': 10,
+                       'export_draco_texcoord_quantization': 12,
+                       'export_draco_color_quantization': 10,
+                       'export_draco_generic_quantization': 12,
+                       'export_image_format': 'WEBP',
+                       'export_image_quality': 80 },
+                   'max_texture_size': 2048,
+                   'decimate_ratio': None },
+
+    # Lossless, keeping all the data that may be exported:
+    'archive': { 'gltf_settings': {
+                     'export_image_format': 'AUTO',
+                     'export_extras': True,
+                     'export_cameras': True,
+                     'export_lights': True },
+                 'max_texture_size': None,
+                 'decimate_ratio': None },
+
+    # Lightweight, low-fidelity thumbnails:
+    'preview': { 'gltf_settings': {
+                     'export_draco_mesh_compression_enable': True,
+                     'export_draco_mesh_compression_level': 10,
+                     'export_draco_position_quantization': 11,
+                     'export_draco_normal_quantization': 8,
+                     'export_draco_texcoord_quantization': 10,
+                     'export_draco_color_quantization': 8,
+                     'export_draco_generic_quantization': 10,
+                     'export_image_format': 'JPEG',
+                     'export_image_quality': 60 },
+                 'max_texture_size': 256,
+                 'decimate_ratio': 0.25 },
+}
+
+default_export_profile = 'default'
+
+
+
+def get_export_profile(profile_name):
+    """Returns the export profile of the specified name."""
+
+    profile = export_profiles.get(profile_name)
+
+    if profile is None:
+        sys.exit("Error, unknown export profile '%s' (known ones: %s)." % (profile_name, ', '.join(sorted(export_profiles))))
+
+    return profile
+
+
+
 def setup_blender_blank_state():
-    """Sets an appropriate initial Blender initial state."""
+    """Sets an appropriate initial Blender initial state.
+
+    May be called again afterwards, to clear any content previously imported
+    (ex: between the conversions done by a given Blender instance)."""
 
     # Not wanting the default collection (with a default cube, light and
     # camera), yet 'bpy.ops.wm.read_factory_settings(use_empty=True)' induces
@@ -68,12 +172,17 @@ def setup_blender_blank_state():
     #[objs.remove(objs[obj], do_unlink=True)
     #    obj in ["Cube", "Light", "Camera"]
 
-    default_collection = bpy.data.collections.get('Collection')
-
-    for obj in default_collection.objects:
+    # Initially only the objects of the default collection:
+    for obj in list(bpy.data.objects):
         bpy.data.objects.remove(obj, do_unlink=True)
 
-    bpy.data.collections.remove(default_collection)
+    for collection in list(bpy.data.collections):
+        bpy.data.collections.remove(collection)
+
+    # Then the data (meshes, materials, images, etc.) left unused, so that
+    # memory does not grow from one import to the next:
+    #
+    bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
 
     # No splash screen wanted either:
     if bpy.context.preferences.view.show_splash:
@@ -81,8 +190,17 @@ def setup_blender_blank_state():
 
 
 
-def get_format(content_file):
-    """Returns the detected file format for the specified file."""
+# Number of bytes read from the start of a file to detect its format:
+sniff_size = 4096
+
+# First keywords of the statements of an OBJ file:
+obj_keywords = { b'v', b'vt', b'vn', b'vp', b'f', b'l', b'p', b'o', b'g', b's',
+                 b'mtllib', b'usemtl', b'cstype', b'deg', b'curv', b'surf' }
+
+
+def get_format_from_extension(content_file):
+    """Returns the file format corresponding to the extension of the specified
+    file."""
 
     extension = (os.path.splitext(content_file)[1]).lower()
     #print( "extension: %s" % (extension,))
@@ -95,13 +213,442 @@ def get_format(content_file):
                   '.obj':  ContentFormat.OBJ,
                   '.ifc':  ContentFormat.IFC }
 
-    detected_format = format_dic.get(extension, ContentFormat.UNKNOWN)
+    return format_dic.get(extension, ContentFormat.UNKNOWN)
+
+
+
+def is_glb(content_file):
+    """Tells whether the specified file is a binary glTF (GLB) one."""
+
+    with open(content_file, 'rb') as f:
+        return f.read(4) == b'glTF'
+
+
+
+def sniff_format(header):
+    """Returns the file format detected from the specified first bytes of a
+    file (regardless of its name), or UNKNOWN if they are inconclusive (ex: a
+    marker such as the "asset" glTF key may lie further in the file)."""
+
+    if header.startswith(b'glTF'):
+        return ContentFormat.GLTF
+
+    if header.startswith(b'Kaydara FBX Binary'):
+        return ContentFormat.FBX
+
+    # Then text formats, possibly starting with a BOM:
+    text = header.lstrip(b'\xef\xbb\xbf').lstrip()
+
+    if text.startswith(b'ISO-10303-21;'):
+        return ContentFormat.IFC
+
+    if text.startswith(b'<') and b'<COLLADA' in header:
+        return ContentFormat.COLLADA
+
+    if text.startswith(b'{') and b'"asset"' in header:
+        return ContentFormat.GLTF
+
+    if text.startswith(b'; FBX') or b'FBXHeaderExtension' in header:
+        return ContentFormat.FBX
+
+    if b'\0' in header:
+        return ContentFormat.UNKNOWN
+
+    # Heuristic for OBJ: all statements (except possibly a truncated last one)
+    # start with a known keyword, and there is at least one of them:
+    lines = header.splitlines()
+
+    if len(header) >= sniff_size:
+        lines = lines[:-1]
+
+    statements = [ line.split()[0] for line in lines
+                   if line.strip() and not line.lstrip().startswith(b'#') ]
+
+    if statements and all(s in obj_keywords for s in statements):
+        return ContentFormat.OBJ
+
+    return ContentFormat.UNKNOWN
+
+
+
+def contradicts_extension(content_file, header):
+    """Tells whether the specified first bytes of the specified file prove that
+    it is not in the format that its extension implies (as opposed to merely
+    lacking the markers of that format)."""
+
+    extension = (os.path.splitext(content_file)[1]).lower()
+
+    # GLB files must start with their magic number:
+    if extension == '.glb':
+        return not header.startswith(b'glTF')
+
+    # All others but FBX are text formats:
+    if extension in ('.gltf', '.dae', '.obj', '.ifc'):
+        return b'\0' in header
+
+    return False
+
+
+
+def get_format(content_file, warn=True):
+    """Returns the detected file format for the specified file, based on its
+    content (so that misnamed or unsupported files are detected before
+    being imported) whenever it can be read and is conclusive, otherwise on its
+    extension; warns about any mismatch, if requested."""
+
+    extension_format = get_format_from_extension(content_file)
+
+    try:
+        with open(content_file, 'rb') as f:
+            header = f.read(sniff_size)
+    except OSError:
+        return extension_format
+
+    detected_format = sniff_format(header)
     #print( "detected_format: %s" % (detected_format,))
 
+    # Inconclusive content (ex: glTF keys, Collada preamble, unusual OBJ
+    # statements) is trusted to match its extension, unless contradicting it:
+    #
+    if detected_format == ContentFormat.UNKNOWN and not contradicts_extension(content_file, header):
+        return extension_format
+
+    if not warn or extension_format in (detected_format, ContentFormat.UNKNOWN):
+        return detected_format
+
+    if detected_format == ContentFormat.UNKNOWN:
+        print("Warning: content file '%s' does not seem to be in the %s format." % (content_file, ContentFormat.to_string(extension_format)))
+    else:
+        print("Warning: content file '%s' is actually in the %s format, not in the %s one." % (content_file, ContentFormat.to_string(detected_format), ContentFormat.to_string(extension_format)))
+
     return detected_format
 
 
 
+# Instrumentation of conversions:
+
+
+def get_peak_rss():
+    """Returns the peak resident set size of the current process so far, in
+    bytes (None if not available)."""
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # In bytes on macOS, in kilobytes elsewhere:
+    if sys.platform == 'darwin':
+        return peak
+
+    return peak * 1024
+
+
+
+def get_scene_statistics():
+    """Returns counts describing the content currently loaded in Blender."""
+
+    return { "objects": len(bpy.data.objects),
+             "meshes": len(bpy.data.meshes),
+             "vertices": sum(len(mesh.vertices) for mesh in bpy.data.meshes),
+             "materials": len(bpy.data.materials) }
+
+
+
+class StageProfiler:
+    """Measures the duration and the memory footprint of the successive stages
+    (ex: setup, import, export) of a conversion.
+
+    As the process-wide peak RSS cannot be reset, a stage is described by the
+    peak reached at its end and by how much it raised it."""
+
+    def __init__(self):
+        self.stages = []
+        self.statistics = None
+        # Any other information about the conversion:
+        self.details = {}
+
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        peak_before = get_peak_rss()
+        try:
+            yield
+        finally:
+            peak_after = get_peak_rss()
+            self.stages.append({ "stage": name,
+                                 "duration": time.perf_counter() - start,
+                                 "peak_rss": peak_after,
+                                 "rss_growth": None if peak_after is None else peak_after - peak_before })
+
+
+    def record_statistics(self):
+        self.statistics = get_scene_statistics()
+
+
+    def to_dict(self):
+        return dict(self.details, stages=self.stages,
+                    statistics=self.statistics, peak_rss=get_peak_rss())
+
+
+
+# Optimisation of the imported content:
+
+
+# For each data type of generic mesh attributes, the name of the property of
+# their elements, the number of values per element, and their array typecode:
+#
+attribute_layouts = { 'FLOAT':        ('value', 1, 'f'),
+                      'INT':          ('value', 1, 'i'),
+                      'INT8':         ('value', 1, 'b'),
+                      'BOOLEAN':      ('value', 1, 'b'),
+                      'INT16_2D':     ('value', 2, 'h'),
+                      'INT32_2D':     ('value', 2, 'i'),
+                      'FLOAT2':       ('vector', 2, 'f'),
+                      'FLOAT_VECTOR': ('vector', 3, 'f'),
+                      'FLOAT_COLOR':  ('color', 4, 'f'),
+                      'BYTE_COLOR':   ('color', 4, 'f'),
+                      'QUATERNION':   ('value', 4, 'f') }
+
+
+
+def get_mesh_signature(mesh):
+    """Returns a digest of the geometry (vertex positions, faces, UV maps,
+    custom normals, other attributes such as colors) and materials of the
+    specified mesh, equal for identical meshes; returns None for the meshes
+    that are not to be shared (ex: with shape keys, or attributes that cannot
+    be compared)."""
+
+    # Shape keys may be animated per object:
+    if mesh.shape_keys is not None:
+        return None
+
+    digest = hashlib.sha1()
+
+    digest.update(repr((len(mesh.vertices), len(mesh.polygons), len(mesh.loops),
+                        [ m.name if m else None for m in mesh.materials ])).encode('utf-8'))
+
+    # Read in bulk (foreach_get), as iterating on elements would be too slow:
+    coordinates = array.array('f', [0.0]) * (3 * len(mesh.vertices))
+    mesh.vertices.foreach_get('co', coordinates)
+    digest.update(coordinates.tobytes())
+
+    vertex_indices = array.array('i', [0]) * len(mesh.loops)
+    mesh.loops.foreach_get('vertex_index', vertex_indices)
+    digest.update(vertex_indices.tobytes())
+
+    for attribute in ('loop_total', 'material_index'):
+        values = array.array('i', [0]) * len(mesh.polygons)
+        mesh.polygons.foreach_get(attribute, values)
+        digest.update(values.tobytes())
+
+    for uv_layer in mesh.uv_layers:
+        uvs = array.array('f', [0.0]) * (2 * len(mesh.loops))
+        uv_layer.data.foreach_get('uv', uvs)
+        digest.update(uvs.tobytes())
+
+    if mesh.has_custom_normals:
+        normals = array.array('f', [0.0]) * (3 * len(mesh.loops))
+        # Blender 4.1 and later compute normals on demand:
+        if hasattr(mesh, 'corner_normals'):
+            mesh.corner_normals.foreach_get('vector', normals)
+        else:
+            mesh.calc_normals_split()
+            mesh.loops.foreach_get('normal', normals)
+        digest.update(normals.tobytes())
+
+    # Attributes already hashed above, or not affecting the rendering (names
+    # starting with a dot, ex: selection states):
+    #
+    hashed_names = { 'position', 'material_index' } | { uv_layer.name for uv_layer in mesh.uv_layers }
+
+    for attribute in mesh.attributes:
+
+        if attribute.name in hashed_names or attribute.name.startswith('.'):
+            continue
+
+        layout = attribute_layouts.get(attribute.data_type)
+        if layout is None:
+            return None
+
+        (key, width, typecode) = layout
+        values = array.array(typecode, [0]) * (width * len(attribute.data))
+        attribute.data.foreach_get(key, values)
+        digest.update(repr((attribute.name, attribute.domain, attribute.data_type)).encode('utf-8'))
+        digest.update(values.tobytes())
+
+    # Before Blender 3.2, vertex colors were not generic attributes:
+    if not hasattr(mesh, 'color_attributes'):
+        for color_layer in mesh.vertex_colors:
+            colors = array.array('f', [0.0]) * (4 * len(mesh.loops))
+            color_layer.data.foreach_get('color', colors)
+            digest.update(colors.tobytes())
+
+    return digest.hexdigest()
+
+
+
+def instance_duplicate_meshes():
+    """Makes the mesh objects whose mesh data are identical share a single
+    mesh (linked instances), and removes the meshes left unused; returns the
+    number of removed meshes."""
+
+    reference_meshes = {}
+    removed_count = 0
+
+    for mesh in list(bpy.data.meshes):
+
+        if mesh.users == 0:
+            continue
+
+        signature = get_mesh_signature(mesh)
+
+        if signature is None:
+            continue
+
+        reference_mesh = reference_meshes.setdefault(signature, mesh)
+
+        if reference_mesh is not mesh:
+            mesh.user_remap(reference_mesh)
+            bpy.data.meshes.remove(mesh)
+            removed_count += 1
+
+    return removed_count
+
+
+
+def merge_by_material():
+    """Joins the static mesh objects (not animated, not parented, with a
+    single-user mesh, so that instances are preserved) using the same
+    materials into a single object per set of materials; returns the number of
+    objects removed by these merges."""
+
+    groups = {}
+
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH' and obj.parent is None and not obj.children and obj.animation_data is None and obj.data.users == 1:
+            key = tuple(slot.material.name if slot.material else None
+                        for slot in obj.material_slots)
+            groups.setdefault(key, []).append(obj)
+
+    merged_count = 0
+
+    for objects in groups.values():
+
+        if len(objects) < 2:
+            continue
+
+        with bpy.context.temp_override(active_object=objects[0],
+                                       selected_objects=objects,
+                                       selected_editable_objects=objects):
+            bpy.ops.object.join()
+
+        merged_count += len(objects) - 1
+
+    return merged_count
+
+
+
+def remove_empty_objects():
+    """Removes the objects not contributing to the rendering: childless empties
+    (not instancing collections) and meshes without vertices; returns the
+    number of removed objects."""
+
+    removed_count = 0
+
+    # As removing children may leave their parents empty:
+    while True:
+
+        empty_objects = [ obj for obj in bpy.data.objects if not obj.children and (
+            (obj.type == 'EMPTY' and obj.instance_type == 'NONE')
+            or (obj.type == 'MESH' and len(obj.data.vertices) == 0)) ]
+
+        if not empty_objects:
+            return removed_count
+
+        for obj in empty_objects:
+            bpy.data.objects.remove(obj, do_unlink=True)
+
+        removed_count += len(empty_objects)
+
+
+
+def optimize_scene(merge=False):
+    """Optimises the imported content for rendering (fewer objects and
+    meshes): turns identical meshes into instances, merges static objects by
+    material if requested, and removes empty objects; returns counts
+    describing what was done."""
+
+    results = { "removed_meshes": instance_duplicate_meshes(),
+                "merged_objects": merge_by_material() if merge else 0,
+                "removed_objects": remove_empty_objects() }
+
+    # Data that became unused (ex: meshes of joined objects):
+    bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+
+    return results
+
+
+
+def get_static_dependencies(content_file, content_format):
+    """Returns the (absolute) paths of the side files that the specified
+    content file references by itself (ex: external buffers and images of a
+    glTF file, material libraries of an OBJ file and their textures); does not
+    require Blender."""
+
+    base_dir = os.path.dirname(os.path.abspath(content_file))
+
+    dependencies = []
+
+    if content_format == ContentFormat.GLTF and not is_glb(content_file):
+
+        with open(content_file, encoding='utf-8') as f:
+            gltf = json.load(f)
+
+        for element in gltf.get('buffers', []) + gltf.get('images', []):
+            uri = element.get('uri')
+            if uri and not uri.startswith('data:'):
+                dependencies.append(os.path.join(base_dir, urllib.parse.unquote(uri)))
+
+    elif content_format == ContentFormat.OBJ:
+
+        with open(content_file, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('mtllib'):
+                    # Material libraries are separated by spaces:
+                    for mtl_name in line.split()[1:]:
+                        dependencies.append(os.path.join(base_dir, mtl_name))
+
+        for mtl_path in list(dependencies):
+            if not os.path.isfile(mtl_path):
+                continue
+            with open(mtl_path, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    tokens = line.split()
+                    # The texture file is the last token, after any option:
+                    if len(tokens) > 1 and (tokens[0].startswith('map_') or tokens[0] in ('bump', 'disp', 'decal', 'refl')):
+                        dependencies.append(os.path.join(os.path.dirname(mtl_path), tokens[-1]))
+
+    return [ os.path.normpath(d) for d in dependencies ]
+
+
+
+def get_image_dependencies():
+    """Returns the (absolute) paths of the external image files that the
+    content currently loaded in Blender relies on (ex: the textures found by
+    image search)."""
+
+    dependencies = []
+
+    for image in bpy.data.images:
+        if image.source == 'FILE' and image.filepath and image.packed_file is None:
+            dependencies.append(os.path.normpath(bpy.path.abspath(image.filepath)))
+
+    return dependencies
+
+
+
 def import_content(content_file_path, content_format, prevent_any_saving=False):
     """Imports the specified content of specified format in Blender."""
 
@@ -166,18 +713,299 @@ def import_content(content_file_path, content_format, prevent_any_saving=False):
 
 
 
-def export_content(target_file, target_format):
+def downscale_textures(max_size):
+    """Downscales (keeping their aspect ratio) the images larger than the
+    specified size; they are then re-encoded when exported. Returns the
+    downscaled images."""
+
+    downscaled_images = []
+
+    for image in bpy.data.images:
+
+        width, height = image.size
+
+        if max(width, height) <= max_size:
+            continue
+
+        factor = max_size / max(width, height)
+
+        print("Downscaling image '%s' from %dx%d by a factor %.3f." % (image.name, width, height, factor))
+
+        image.scale(max(1, round(width * factor)), max(1, round(height * factor)))
+
+        downscaled_images.append(image)
+
+    return downscaled_images
+
+
+
+def decimate_meshes(ratio):
+    """Adds to all mesh objects a decimation modifier keeping the specified
+    ratio of their faces; it is applied when exporting. Returns the added
+    (object, modifier) pairs."""
+
+    added_modifiers = []
+
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH':
+            modifier = obj.modifiers.new(name="Snake-Decimate", type='DECIMATE')
+            modifier.decimate_type = 'COLLAPSE'
+            modifier.ratio = ratio
+            added_modifiers.append((obj, modifier))
+
+    return added_modifiers
+
+
+
+def parse_output_spec(output_spec):
+    """Returns the (profile name, file suffix) pair corresponding to the
+    specified output specification, of the form PROFILE[:SUFFIX] (ex:
+    'preview:-lod.glb'); the default suffix is '.PROFILE.glb'."""
+
+    profile_name, _, suffix = output_spec.partition(':')
+
+    get_export_profile(profile_name)
+
+    return profile_name, suffix or '.%s.glb' % (profile_name,)
+
+
+
+def get_output_files(content_file, profile_name=default_export_profile,
+                     extra_output_specs=()):
+    """Returns the (target file, profile name) pairs of the outputs to export
+    from the specified content file: first the main output (same name, with
+    the .glb extension), then the extra ones."""
+
+    content_basename = os.path.splitext(content_file)[0]
+
+    outputs = [ (content_basename + '.glb', profile_name) ]
+
+    for output_spec in extra_output_specs:
+        extra_profile, suffix = parse_output_spec(output_spec)
+        outputs.append((content_basename + suffix, extra_profile))
+
+    return outputs
+
+
+
+def parse_lod_levels(ratios_spec=None, budgets_spec=None):
+    """Returns the levels of detail described by the specified comma-separated
+    decimation ratios (ex: '0.5,0.2,0.05', from the finest level to the
+    coarsest one) and/or triangle budgets (ex: '200000,50000,10000'), as a list
+    of {"ratio": R, "budget": B} dictionaries. When both are specified, each
+    level is decimated to the lowest of its ratio and its budget."""
+
+    try:
+        ratios = [ float(r) for r in ratios_spec.split(',') ] if ratios_spec else []
+        budgets = [ int(b) for b in budgets_spec.split(',') ] if budgets_spec else []
+    except ValueError as e:
+        sys.exit("Error, invalid level of detail specification: %s." % (e,))
+
+    if ratios and budgets and len(ratios) != len(budgets):
+        sys.exit("Error, %d LOD ratios specified, yet %d LOD budgets." % (len(ratios), len(budgets)))
+
+    if not all(0.0 < r <= 1.0 for r in ratios):
+        sys.exit("Error, LOD ratios must be in ]0.0, 1.0] (got: %s)." % (ratios_spec,))
+
+    if not all(b > 0 for b in budgets):
+        sys.exit("Error, LOD budgets must be strictly positive (got: %s)." % (budgets_spec,))
+
+    level_count = max(len(ratios), len(budgets))
+
+    return [ { "ratio": ratios[i] if ratios else 1.0,
+               "budget": budgets[i] if budgets else None }
+             for i in range(level_count) ]
+
+
+
+def get_lod_files(content_file, lod_levels):
+    """Returns the paths of the files of the specified levels of detail of the
+    specified content file (LOD 0 being its main output), and the path of
+    their manifest."""
+
+    content_basename = os.path.splitext(content_file)[0]
+
+    lod_files = [ '%s.lod%d.glb' % (content_basename, i)
+                  for i in range(1, len(lod_levels) + 1) ]
+
+    return lod_files, content_basename + '.lods.json'
+
+
+
+def get_supported_settings(operator, settings):
+    """Returns the specified settings minus the ones that the specified
+    operator does not support (ex: with older Blender versions)."""
+
+    known_names = operator.get_rna_type().properties.keys()
+
+    supported_settings = {}
+
+    for name, value in settings.items():
+        if name in known_names:
+            supported_settings[name] = value
+        else:
+            print("Warning: setting '%s' not supported by this Blender version, ignored." % (name,))
+
+    return supported_settings
+
+
+
+def count_triangles():
+    """Returns the number of triangles of the mesh objects of the scene, once
+    evaluated (i.e. with their modifiers applied)."""
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+
+    triangle_count = 0
+
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH':
+            evaluated_obj = obj.evaluated_get(depsgraph)
+            mesh = evaluated_obj.to_mesh()
+            mesh.calc_loop_triangles()
+            triangle_count += len(mesh.loop_triangles)
+            evaluated_obj.to_mesh_clear()
+
+    return triangle_count
+
+
+
+def count_decimated_triangles(decimate_ratio):
+    """Returns the number of triangles of the mesh objects of the scene, once
+    decimated according to the specified ratio, the content being left as it
+    was."""
+
+    if not decimate_ratio or decimate_ratio >= 1.0:
+        return count_triangles()
+
+    added_modifiers = decimate_meshes(decimate_ratio)
+
+    try:
+        return count_triangles()
+
+    finally:
+        for obj, modifier in added_modifiers:
+            obj.modifiers.remove(modifier)
+
+
+
+def export_content(target_file, target_format, profile_name=default_export_profile,
+                   decimate_ratio=None, report_triangles=False):
     """Exports the current 3D content in the target file, using the target
-format.Focuses on the objects (as a whole) of the scene."""
+    format and the specified export profile (see export_profiles), whose
+    decimation ratio may be overridden. If requested, returns the number of
+    exported triangles.
+
+    The content is left as it was, so that it can be exported again (ex: with
+    another profile) without having to be imported again."""
+
+    profile = get_export_profile(profile_name)
+
+    if decimate_ratio is None:
+        decimate_ratio = profile['decimate_ratio']
+
+    triangle_count = None
 
     # See https://docs.blender.org/api/current/bpy.ops.export_scene.html:
     if target_format == ContentFormat.GLTF:
 
-        bpy.ops.export_scene.gltf(filepath=target_file, export_format='GLB')
+        settings = dict(gltf_export_settings, **profile['gltf_settings'])
+
+        downscaled_images = []
+        added_modifiers = []
+
+        try:
+            if profile['max_texture_size']:
+                downscaled_images = downscale_textures(profile['max_texture_size'])
+
+            if decimate_ratio and decimate_ratio < 1.0:
+                added_modifiers = decimate_meshes(decimate_ratio)
+                settings['export_apply'] = True
+
+            settings = get_supported_settings(bpy.ops.export_scene.gltf, settings)
+
+            if report_triangles:
+                triangle_count = count_triangles()
+
+            bpy.ops.export_scene.gltf(filepath=target_file, **settings)
+
+        finally:
+            # Back to the original content (reloaded from its file or packed
+            # data):
+            #
+            for image in downscaled_images:
+                image.reload()
+
+            for obj, modifier in added_modifiers:
+                obj.modifiers.remove(modifier)
 
     else:
         sys.exit("Error, the target format ('" + ContentFormat.to_string(target_format) + "') for the content to export is not supported.")
 
+    return triangle_count
+
+
+
+def export_lods(content_file, lod_levels, profile_name=default_export_profile):
+    """Exports, from the current 3D content, the specified levels of detail of
+    the specified content file (see parse_lod_levels), and writes their
+    manifest; returns the paths of the written files.
+
+    The main output of the content file (see get_output_files) is expected to
+    have already been exported, as it is listed as the finest level (LOD 0)."""
+
+    main_file = get_output_files(content_file, profile_name)[0][0]
+
+    lod_files, manifest_file = get_lod_files(content_file, lod_levels)
+
+    total_triangles = count_triangles()
+
+    # The main output is itself decimated as its profile tells, and the ratios
+    # of the levels apply to it; recorded ratios are relative to the source:
+    #
+    base_ratio = get_export_profile(profile_name)['decimate_ratio'] or 1.0
+
+    levels = [ { "level": 0,
+                 "file": os.path.basename(main_file),
+                 "ratio": base_ratio,
+                 "triangles": count_decimated_triangles(base_ratio),
+                 "size": os.path.getsize(main_file) } ]
+
+    for i, (lod_level, lod_file) in enumerate(zip(lod_levels, lod_files), 1):
+
+        ratio = lod_level["ratio"] * base_ratio
+        budget = lod_level["budget"]
+
+        if budget is not None and total_triangles > 0:
+            ratio = min(ratio, budget / total_triangles)
+
+        print("### Exporting LOD %d in '%s', with a decimation ratio of %.4f." % (i, lod_file, ratio))
+
+        triangle_count = export_content(lod_file, ContentFormat.GLTF, profile_name,
+                                        decimate_ratio=ratio, report_triangles=True)
+
+        # Decimation cannot always reach the requested ratio (ex: to preserve
+        # the topology):
+        #
+        if budget is not None and triangle_count > budget:
+            print("Warning: LOD %d has %d triangles, exceeding its budget of %d." % (i, triangle_count, budget))
+
+        levels.append({ "level": i,
+                        "file": os.path.basename(lod_file),
+                        "ratio": ratio,
+                        "budget": budget,
+                        "triangles": triangle_count,
+                        "size": os.path.getsize(lod_file) })
+
+    manifest = { "source": os.path.basename(content_file),
+                 "profile": profile_name,
+                 "levels": levels }
+
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return lod_files + [ manifest_file ]
+
 
 
 def focus_on_objects():
@@ -12,7 +12,7 @@ __doc__         = __title__ + '\n' + __comments__
 
 
 # Import standard python modules:
-import sys, types, string
+import sys, types, string, hashlib, struct, mmap, collections
 
 # Import home-made modules:
 import general_utils
@@ -215,6 +215,14 @@ class Node:
             return None
 
 
+    def diff_with(self, other):
+        """
+        Returns a TreeDiff telling how the tree whose root is the other node
+        differs from the one whose root is this node.
+        """
+        return diff_trees(self, other)
+
+
     def display(self):
         """Displays this node."""
         print('content  = %s' % (self.content,))
@@ -222,6 +230,519 @@ class Node:
 
 
 
+class TreeDiff:
+    """
+    Records the differences found between a reference tree and a new one, as
+    established by diff_trees:
+     - inserted: nodes of the new tree having no counterpart in the reference
+       one (only the root of each inserted subtree is listed)
+     - deleted: nodes of the reference tree having no counterpart in the new
+       one (only the root of each deleted subtree is listed)
+     - moved: (reference node, new node) pairs of identical subtrees that
+       changed of parent
+     - updated: (reference node, new node) pairs of matched nodes whose own
+       content changed
+    """
+
+    def __init__(self):
+        self.inserted = []
+        self.deleted = []
+        self.moved = []
+        self.updated = []
+
+
+    def is_empty(self):
+        """Returns true if and only if no difference was recorded."""
+        return not (self.inserted or self.deleted or self.moved or self.updated)
+
+
+    def __repr__(self):
+        return "Tree diff with %s inserted, %s deleted, %s moved and %s updated node(s)" % (len(self.inserted), len(self.deleted), len(self.moved), len(self.updated))
+
+
+
+def content_key(content):
+    """
+    Returns a bytes key identifying specified node content, as used for
+    hashing and matching.
+    """
+    return repr(content).encode('utf-8')
+
+
+
+def compute_subtree_hashes(root):
+    """
+    Returns a dictionary whose keys are the identifiers (id) of the nodes of
+    specified tree, and whose values are their Merkle hash, i.e. a digest of
+    their content and of the hashes of their children, in order.
+
+    Two subtrees having the same hash are thus identical. The tree is walked
+    iteratively (post-order), so that deep trees do not hit the recursion
+    limit.
+    """
+    hashes = {}
+
+    # Pairs of a node and of whether its children have already been pushed:
+    stack = [(root, False)]
+
+    while stack:
+        (node, expanded) = stack.pop()
+        if expanded:
+            h = hashlib.sha1(content_key(node.content))
+            for c in node.children or []:
+                h.update(hashes[id(c)])
+            hashes[id(node)] = h.digest()
+        else:
+            stack.append((node, True))
+            for c in node.children or []:
+                stack.append((c, False))
+
+    return hashes
+
+
+
+def iter_subtrees(roots):
+    """
+    Yields, in pre-order, the nodes of the subtrees of the specified roots
+    (iteratively, see compute_subtree_hashes).
+    """
+    to_visit = list(reversed(roots))
+    while to_visit:
+        n = to_visit.pop()
+        yield n
+        to_visit.extend(reversed(n.children or []))
+
+
+
+def diff_trees(reference, new):
+    """
+    Returns a TreeDiff describing how the 'new' tree differs from the
+    'reference' one.
+
+    Both roots are considered as matching. Then, for each pair of matched
+    nodes, their children are matched first by subtree hash (identical
+    subtrees), then by content; the subtrees of a matched pair having the
+    same hash are skipped as a whole, and the remaining children found at the
+    same position on both sides are matched as well (as updated nodes), unless
+    an identical subtree exists anywhere on the other side (as they may have
+    moved instead). Unmatched subtrees (or parts thereof) found on both sides
+    with the same hash are reported as moved, the other ones as deleted or
+    inserted.
+
+    Runs in time roughly linear in the size of both trees, and proportional to
+    the size of the differences once the hashes are computed.
+    """
+    ref_hashes = compute_subtree_hashes(reference)
+    new_hashes = compute_subtree_hashes(new)
+
+    # To tell whether a subtree has an identical twin on the other side:
+    ref_hash_set = set(ref_hashes.values())
+    new_hash_set = set(new_hashes.values())
+
+    res = TreeDiff()
+
+    # Unmatched subtrees, kept in order of discovery:
+    unmatched_ref = []
+    unmatched_new = []
+
+    pairs = [(reference, new)]
+
+    while pairs:
+
+        (ref_node, new_node) = pairs.pop()
+
+        if ref_hashes[id(ref_node)] == new_hashes[id(new_node)]:
+            continue
+
+        if ref_node.content != new_node.content:
+            res.updated.append((ref_node, new_node))
+
+        ref_children = ref_node.children or []
+        new_children = new_node.children or []
+
+        # Typically leaves:
+        if not ref_children and not new_children:
+            continue
+
+        # First pass: identical subtrees, matched by hash.
+        # Keys are hashes, values are the lists of still unmatched children:
+        by_hash = {}
+        for c in ref_children:
+            by_hash.setdefault(ref_hashes[id(c)], collections.deque()).append(c)
+
+        remaining_new = []
+        for c in new_children:
+            candidates = by_hash.get(new_hashes[id(c)])
+            if candidates:
+                candidates.popleft()
+            else:
+                remaining_new.append(c)
+
+        remaining_ref = [c for l in by_hash.values() for c in l]
+        if len(remaining_ref) > 1:
+            # Restores the original order of the children:
+            order = {id(c): i for (i, c) in enumerate(ref_children)}
+            remaining_ref.sort(key=lambda c: order[id(c)])
+
+        # Second pass: changed subtrees, matched by content:
+        by_content = {}
+        for c in remaining_ref:
+            by_content.setdefault(content_key(c.content), collections.deque()).append(c)
+
+        leftover_new = []
+        for c in remaining_new:
+            candidates = by_content.get(content_key(c.content))
+            if candidates:
+                pairs.append((candidates.popleft(), c))
+            else:
+                leftover_new.append(c)
+
+        # Third pass: children still unmatched yet found at the same position
+        # on both sides are deemed updated, unless having an identical twin on
+        # the other side (then being rather moved, see below):
+        #
+        leftover_ref = {}
+        for l in by_content.values():
+            for c in l:
+                leftover_ref[id(c)] = c
+
+        if leftover_ref and leftover_new:
+            ref_positions = {id(c): i for (i, c) in enumerate(ref_children)}
+            by_position = {ref_positions[k]: c for (k, c) in leftover_ref.items() if not ref_hashes[k] in new_hash_set}
+            next_leftover = 0
+            for (i, c) in enumerate(new_children):
+                if next_leftover < len(leftover_new) and c is leftover_new[next_leftover]:
+                    next_leftover += 1
+                    match = None
+                    if not new_hashes[id(c)] in ref_hash_set:
+                        match = by_position.pop(i, None)
+                    if match is None:
+                        unmatched_new.append(c)
+                    else:
+                        del leftover_ref[id(match)]
+                        pairs.append((match, c))
+        else:
+            unmatched_new.extend(leftover_new)
+
+        unmatched_ref.extend(leftover_ref.values())
+
+    # Unmatched subtrees (or parts thereof) that are identical on both sides
+    # have just moved:
+    #
+    moved_candidates = {}
+    for n in iter_subtrees(unmatched_ref):
+        moved_candidates.setdefault(ref_hashes[id(n)], collections.deque()).append(n)
+
+    # Identifiers of the reference nodes already moved, with their subtree:
+    moved_ids = set()
+
+    def pop_candidate(h):
+        candidates = moved_candidates.get(h)
+        while candidates:
+            n = candidates.popleft()
+            if not id(n) in moved_ids:
+                moved_ids.update(id(d) for d in iter_subtrees([n]))
+                return n
+        return None
+
+    # The inserted subtrees may contain moved ones:
+    to_visit = [(c, True) for c in reversed(unmatched_new)]
+    while to_visit:
+        (c, is_root) = to_visit.pop()
+        match = pop_candidate(new_hashes[id(c)])
+        if match is not None:
+            res.moved.append((match, c))
+            continue
+        if is_root:
+            res.inserted.append(c)
+        to_visit.extend((d, False) for d in reversed(c.children or []))
+
+    # Deleted subtrees may have had parts of them moved:
+    res.deleted.extend(c for c in unmatched_ref if not id(c) in moved_ids)
+
+    return res
+
+
+
+# Binary tree format.
+#
+# Trees can be stored in a versioned binary format that can be memory-mapped,
+# so that their nodes can be accessed lazily, without building Node
+# instances. All integers are little-endian. A file is made of:
+#  - a header: magic, format version, node count, string count, and the
+#    offsets of the node table, of the string offset table and of the string
+#    data
+#  - the node table: one fixed-size record per node, in breadth-first order
+#    (so that the children of a node are contiguous), telling the index of its
+#    content in the string pool (or -1 if it has none), the index of its first
+#    child and its number of children
+#  - the string offset table: string_count + 1 offsets in the string data
+#  - the string data: the UTF-8 encoded contents, each one stored only once
+
+tree_file_magic = b'CNTR'
+tree_file_version = 1
+
+tree_header_format = '<4sHHQQQQQ'
+tree_header_size = struct.calcsize(tree_header_format)
+
+tree_node_format = '<qQQ'
+tree_node_size = struct.calcsize(tree_node_format)
+
+
+
+def save_tree(root, filename):
+    """
+    Stores the tree whose root is specified in the specified file, in the
+    binary tree format. Node contents must be strings (or None).
+    """
+
+    # Keys are contents, values are their index in the string pool:
+    string_indexes = {}
+    strings = []
+
+    records = []
+
+    # Breadth-first walk, the next child index being the current number of
+    # enqueued nodes:
+    queue = [root]
+    current = 0
+
+    while current < len(queue):
+
+        node = queue[current]
+        current += 1
+
+        content = node.content
+
+        if content is None:
+            content_index = -1
+        elif isinstance(content, str):
+            content_index = string_indexes.get(content)
+            if content_index is None:
+                content_index = len(strings)
+                string_indexes[content] = content_index
+                strings.append(content.encode('utf-8'))
+        else:
+            raise DataUtilsException("save_tree: unsupported content type for '%s' (only strings can be stored)." % (content,))
+
+        children = node.children or []
+        records.append((content_index, len(queue), len(children)))
+        queue.extend(children)
+
+    node_count = len(records)
+    string_count = len(strings)
+
+    node_table_offset = tree_header_size
+    string_offsets_offset = node_table_offset + node_count * tree_node_size
+    string_data_offset = string_offsets_offset + (string_count + 1) * 8
+
+    with open(filename, 'wb') as f:
+
+        f.write(struct.pack(tree_header_format, tree_file_magic, tree_file_version, 0, node_count, string_count, node_table_offset, string_offsets_offset, string_data_offset))
+
+        node_struct = struct.Struct(tree_node_format)
+        f.write(b''.join(node_struct.pack(*r) for r in records))
+
+        offset = 0
+        offsets = [0]
+        for b in strings:
+            offset += len(b)
+            offsets.append(offset)
+        f.write(struct.pack('<%sQ' % (string_count + 1,), *offsets))
+
+        f.write(b''.join(strings))
+
+
+
+class MappedTree:
+    """
+    A read-only tree loaded lazily, through mmap, from a file in the binary
+    tree format (see save_tree). Only the pages actually accessed are read.
+    """
+
+    def __init__(self, filename):
+        """Opens and maps specified tree file."""
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise DataUtilsException("MappedTree: file '%s' is empty." % (filename,))
+
+        if len(self.map) < tree_header_size:
+            self.close()
+            raise DataUtilsException("MappedTree: file '%s' is truncated." % (filename,))
+
+        (magic, version, flags, self.node_count, self.string_count, self.node_table_offset, self.string_offsets_offset, self.string_data_offset) = struct.unpack_from(tree_header_format, self.map, 0)
+
+        if magic != tree_file_magic:
+            self.close()
+            raise DataUtilsException("MappedTree: file '%s' is not a tree file." % (filename,))
+
+        if version != tree_file_version:
+            self.close()
+            raise DataUtilsException("MappedTree: unsupported version %s for tree file '%s'." % (version, filename))
+
+        # The node table, the string offset table and the string data must all
+        # lie within the file:
+        #
+        size = len(self.map)
+        string_data_size = None
+        if self.string_offsets_offset + (self.string_count + 1) * 8 <= size:
+            string_data_size = struct.unpack_from('<Q', self.map, self.string_offsets_offset + self.string_count * 8)[0]
+
+        if string_data_size is None or self.node_table_offset + self.node_count * tree_node_size > size or self.string_data_offset + string_data_size > size:
+            self.close()
+            raise DataUtilsException("MappedTree: file '%s' is truncated." % (filename,))
+
+        self.node_struct = struct.Struct(tree_node_format)
+
+
+    def close(self):
+        """
+        Releases the resources associated to this tree. The views returned by
+        get_bytes shall be released first, otherwise BufferError is raised
+        (once the file is closed, the mapping being then unmapped only when
+        they are released).
+        """
+        try:
+            if self.map is not None:
+                self.map.close()
+        finally:
+            self.map = None
+            self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __len__(self):
+        """Returns the number of nodes of this tree."""
+        return self.node_count
+
+
+    def get_root(self):
+        """Returns the root node of this tree."""
+        return MappedNode(self, 0)
+
+
+    def get_record(self, index):
+        """
+        Returns the (content index, first child index, child count) triplet
+        of the node of specified index.
+        """
+        return self.node_struct.unpack_from(self.map, self.node_table_offset + index * tree_node_size)
+
+
+    def get_string(self, index):
+        """Returns the string of specified index in the string pool."""
+        (start, end) = struct.unpack_from('<QQ', self.map, self.string_offsets_offset + index * 8)
+        return self.map[self.string_data_offset + start:self.string_data_offset + end].decode('utf-8')
+
+
+    def get_bytes(self, index):
+        """
+        Returns a zero-copy view onto the UTF-8 bytes of the string of
+        specified index in the string pool; it is to be released (see close)
+        before this tree is closed.
+        """
+        (start, end) = struct.unpack_from('<QQ', self.map, self.string_offsets_offset + index * 8)
+        return memoryview(self.map)[self.string_data_offset + start:self.string_data_offset + end]
+
+
+    def to_node(self):
+        """Builds and returns the full Node tree corresponding to this file."""
+        nodes = []
+        for index in range(self.node_count):
+            (content_index, first_child, child_count) = self.get_record(index)
+            content = None
+            if content_index >= 0:
+                content = self.get_string(content_index)
+            nodes.append(Node(content))
+
+        # Children being contiguous, they can be sliced directly:
+        for index in range(self.node_count):
+            (content_index, first_child, child_count) = self.get_record(index)
+            if child_count:
+                nodes[index].children = nodes[first_child:first_child + child_count]
+
+        return nodes[0]
+
+
+
+class MappedNode:
+    """
+    A lightweight, read-only view onto a node of a MappedTree, offering the
+    read accessors of Node.
+    """
+
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+
+    def __repr__(self):
+        return "Mapped node #%s (content: %s)" % (self.index, self.get_content())
+
+
+    def get_content(self):
+        """Returns this node's content (decoded at each call)."""
+        content_index = self.tree.get_record(self.index)[0]
+        if content_index < 0:
+            return None
+        return self.tree.get_string(content_index)
+
+    content = property(get_content)
+
+
+    def get_child_count(self):
+        """Returns the number of children of this node."""
+        return self.tree.get_record(self.index)[2]
+
+
+    def get_child(self, rank):
+        """Returns the child of specified rank of this node."""
+        (content_index, first_child, child_count) = self.tree.get_record(self.index)
+        if not 0 <= rank < child_count:
+            raise IndexError("MappedNode.get_child: no child of rank %s." % (rank,))
+        return MappedNode(self.tree, first_child + rank)
+
+
+    def get_children(self):
+        """Returns this node's children."""
+        (content_index, first_child, child_count) = self.tree.get_record(self.index)
+        return [MappedNode(self.tree, i) for i in range(first_child, first_child + child_count)]
+
+    children = property(get_children)
+
+
+    def search_children(self, content):
+        """Searches through node's children the first, if any, that has
+        specified content."""
+        for c in self.get_children():
+            if c.get_content() == content:
+                return c
+        return None
+
+
+
+def load_tree(filename):
+    """
+    Returns a MappedTree corresponding to specified file, in the binary tree
+    format; its nodes are read only when accessed.
+    """
+    return MappedTree(filename)
+
+
+
 class NodeExample(Node):
 
     def __init__(self, name=None):
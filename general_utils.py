@@ -12,7 +12,13 @@ __doc__         = __title__ + '\n' + __comments__
 
 
 # Import standard python modules:
-import os, sys, types, string
+import os, sys, types, string, time, atexit, weakref, threading, queue, shutil, gzip, json, multiprocessing
+
+# Optional, faster JSON serializer:
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class GeneralUtilsException(Exception):
@@ -67,7 +73,32 @@ class Display:
 
     do_debug = True
 
-    def __init__(self, spacing=10, compression=True, truncate=False, verbosity=2):
+    # Message levels, as accepted by is_enabled:
+    normal_level  = 'normal'
+    key_level     = 'key'
+    info_level    = 'info'
+    debug_level   = 'debug'
+    warning_level = 'warning'
+    error_level   = 'error'
+
+    # Flush policies, telling when the messages written are to be flushed
+    # (warnings and errors are flushed immediately, whatever the policy):
+    #  - flush_always: after each message
+    #  - flush_by_line: after each message ending a line
+    #  - flush_by_size: once at least flush_size bytes are pending
+    #  - flush_by_period: once flush_period seconds elapsed since last flush
+    #    (the clock being checked only when a message is displayed: pending
+    #    messages are not flushed by a timer)
+    #  - flush_on_error: only when a warning or an error is displayed
+    flush_always    = 'always'
+    flush_by_line   = 'line'
+    flush_by_size   = 'size'
+    flush_by_period = 'period'
+    flush_on_error  = 'error'
+
+    flush_policies = [flush_always, flush_by_line, flush_by_size, flush_by_period, flush_on_error]
+
+    def __init__(self, spacing=10, compression=True, truncate=False, verbosity=2, flush_policy=flush_always, flush_size=64*1024, flush_period=1.0):
         """
         Defines the options for this display to perform its tasks.
             - spacing: minimum size for a field
@@ -77,6 +108,17 @@ class Display:
                 - 0: totally silent,
                 - 1: only the most important messages are displayed, those that start with prefix_for_key_messages
                 - 2: all messages are displayed
+            - flush_policy: tells when messages are flushed (see flush_policies)
+            - flush_size: number of pending bytes triggering a flush, for the flush_by_size policy
+            - flush_period: minimum duration, in seconds, between flushes, for the flush_by_period policy (checked only when a new message is displayed, so the last messages remain pending until the next one, an explicit flush or exit)
+
+        Unless flushing after each message, pending messages are flushed at
+        exit, and when leaving a with block using this display.
+
+        Messages may be format strings, applied to the tuple of arguments given
+        as their args keyword (ex: d.info('%s found', args=(name,))), or
+        callables returning the actual message; either way they are evaluated
+        only if they are to be displayed.
             """
 
         self.esp = spacing and (lambda s, space_num=spacing: str.ljust(s, space_num)) or (lambda s: s)
@@ -85,46 +127,87 @@ class Display:
         self.verb = verbosity
         self.offset = 0
 
+        if not flush_policy in self.flush_policies:
+            raise GeneralUtilsException("Display: unknown flush policy '%s'." % (flush_policy,))
+
+        self.flush_policy = flush_policy
+        self.flush_size = flush_size
+        self.flush_period = flush_period
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+        if flush_policy != self.flush_always:
+            displays_to_flush.add(self)
+
+
+    def is_enabled(self, level):
+        """
+        Tells whether messages of specified level would be displayed; allows
+        callers to skip the building of messages that would be discarded.
+        """
+        if level == self.normal_level:
+            return self.verb == 2
+        if level == self.key_level:
+            return self.verb >= 1
+        if level == self.debug_level:
+            return self.do_debug
+        return True
+
+
+    def render(self, message, args):
+        """
+        Returns the text of specified message: a callable is called, and a
+        format string is applied to the specified arguments, if any.
+        """
+        if callable(message):
+            message = message()
+        if args:
+            message = message % args
+        return message
+
 
-    def display(self, message, add_return=True):
+    def display(self, message, add_return=True, args=()):
         """Displays unconditionnally specified normal message."""
-        if add_return:
-            self.inner_display_normal(self.normal_prefix + self.offset * ' ' + message + '\n')
-        else:
-            self.inner_display_normal(self.normal_prefix + self.offset * ' ' + message)
+        self.inner_display(self.normal_level, self.render(message, args), add_return)
 
 
-    def info(self, message, add_return=True):
+    def info(self, message, add_return=True, args=()):
         """Displays specified information message."""
-        if add_return:
-            self.inner_display_normal(self.info_prefix + message + '\n')
-        else:
-            self.inner_display_normal(self.info_prefix + message)
+        self.inner_display(self.info_level, self.render(message, args), add_return)
 
 
-    def debug(self, message, add_return=True):
+    def debug(self, message, add_return=True, args=()):
         """Displays specified debug message if and only if we are in debug mode."""
         if self.do_debug:
-            if add_return:
-                self.inner_display_normal(self.debug_prefix + message + '\n')
-            else:
-                self.inner_display_normal(self.debug_prefix + message)
+            self.inner_display(self.debug_level, self.render(message, args), add_return)
 
 
-    def warning(self, message, add_return=True):
+    def warning(self, message, add_return=True, args=()):
         """Displays specified warning message."""
-        if add_return:
-            self.inner_display_error(self.warning_prefix + message + '\n')
-        else:
-            self.inner_display_error(self.warning_prefix + message)
+        self.inner_display(self.warning_level, self.render(message, args), add_return)
 
 
-    def error(self, message, add_return=True):
+    def error(self, message, add_return=True, args=()):
         """Displays specified error message."""
+        self.inner_display(self.error_level, self.render(message, args), add_return)
+
+
+    def inner_display(self, level, message, add_return):
+        """
+        Displays specified (already rendered) message of specified level,
+        prefixed according to this level; may be redefined by implementation
+        classes that do not output text lines.
+        """
+        if level == self.normal_level:
+            message = self.normal_prefix + self.offset * ' ' + message
+        else:
+            message = getattr(self, level + '_prefix') + message
         if add_return:
-            self.inner_display_error(self.error_prefix + message + '\n')
+            message += '\n'
+        if level == self.warning_level or level == self.error_level:
+            self.inner_display_error(message)
         else:
-            self.inner_display_error(self.error_prefix + message)
+            self.inner_display_normal(message)
 
 
     def inner_display_normal(self, message):
@@ -135,6 +218,47 @@ class Display:
         pass
 
 
+    def inner_flush(self):
+        """
+        Pure virtual function, to be redefined by implementation classes, so
+        that any pending message is actually written.
+        """
+        pass
+
+
+    def must_flush(self, message):
+        """
+        Tells whether, according to the flush policy, messages must be
+        flushed now that specified one has been written.
+        """
+        policy = self.flush_policy
+        if policy == self.flush_always:
+            return True
+        self.pending_size += len(message)
+        if policy == self.flush_by_line:
+            return message.endswith('\n')
+        if policy == self.flush_by_size:
+            return self.pending_size >= self.flush_size
+        if policy == self.flush_by_period:
+            return time.monotonic() - self.last_flush >= self.flush_period
+        return False
+
+
+    def flush(self):
+        """Flushes any pending message."""
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+        self.inner_flush()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
     def indent(self):
         """Indents one more level for normal messages."""
         self.offset += self.offset_increment
@@ -156,13 +280,21 @@ class Display:
         self.inner_display_normal('Verbosity level is %s.' % (self.verb,))
 
 
-    def __call__(self, message, add_return=True):
-        if type(message) == str:
-            if self.verb == 2 or ((self.verb == 1) and (message[:2] == self.prefix_for_key_messages)):
-                self.display(self.esp(self.trunc(self.comp(message))), add_return)
-        elif type(message) in [list,tuple]:
+    def __call__(self, message, add_return=True, args=()):
+        if not self.verb:
+            return
+        if type(message) in [list,tuple]:
             for item in message:
-                self.__call__(item, add_return)
+                self.__call__(item, add_return, args)
+            return
+        if callable(message):
+            message = message()
+        if type(message) == str:
+            # Checking the format string is enough to spot key messages:
+            if self.verb == 2 or message[:2] == self.prefix_for_key_messages:
+                if args:
+                    message = message % args
+                self.display(self.esp(self.trunc(self.comp(message))), add_return=add_return)
         else:
             print('Display: unsupported message type, unable to display it.')
 
@@ -172,29 +304,52 @@ class Display:
 
 
 
+# The displays that may have pending messages, to be flushed at exit by a
+# single hook, without being kept alive by it:
+#
+displays_to_flush = weakref.WeakSet()
+
+
+def flush_all_at_exit():
+    """Flushes the displays that may have pending messages."""
+    for display in list(displays_to_flush):
+        display.flush()
+
+
+atexit.register(flush_all_at_exit)
+
+
+
 class ScreenDisplay(Display):
     """
     This is the Display implementation that uses screen as display output
     device.
     """
 
-    def __init__(self, spacing=10, compression=True, truncate=False, verbosity=2):
+    def __init__(self, spacing=10, compression=True, truncate=False, verbosity=2, flush_policy=Display.flush_always, flush_size=64*1024, flush_period=1.0):
         # Propagates back settings to ancestor class' constructor.
-        Display.__init__(self, spacing, compression, truncate, verbosity)
+        Display.__init__(self, spacing, compression, truncate, verbosity, flush_policy, flush_size, flush_period)
 
 
     def inner_display_normal(self, message):
         """Displays a message to standard output file descriptor."""
         sys.stdout.write(message)
-        sys.stdout.flush()
+        if self.must_flush(message):
+            self.flush()
 
 
     def inner_display_error(self, message):
         """Displays a message to error output file descriptor."""
+        # Pending normal messages are output first, to preserve ordering:
+        self.flush()
         sys.stderr.write(message)
         sys.stderr.flush()
 
 
+    def inner_flush(self):
+        sys.stdout.flush()
+
+
 
 class FileDisplay(Display):
     """This is the Display implementation that uses files as display
@@ -203,7 +358,7 @@ class FileDisplay(Display):
     default_log_base_name = "Log"
     default_extension = "txt"
 
-    def __init__(self, log_base_name=default_log_base_name, allow_overwrite=True, spacing=10, compression=True, truncate=False, verbosity=2):
+    def __init__(self, log_base_name=default_log_base_name, allow_overwrite=True, spacing=10, compression=True, truncate=False, verbosity=2, flush_policy=Display.flush_always, flush_size=64*1024, flush_period=1.0):
         """
         Implements the Display interface so that messages are output to a log file:
             - log_filename: defines the file where messages should be stored
@@ -211,7 +366,8 @@ class FileDisplay(Display):
             - the other parameters have the same semantics as the Display ones
         """
 
-        Display.__init__(self, spacing=10, compression=True, truncate=False, verbosity=2)
+        self.log_file = None
+        Display.__init__(self, spacing, compression, truncate, verbosity, flush_policy, flush_size, flush_period)
         self.log_base_name = log_base_name
         self.allow_overwrite = allow_overwrite
         self.log_filename = self.log_base_name + "." + self.default_extension
@@ -230,20 +386,368 @@ class FileDisplay(Display):
 
     def inner_display_normal(self, message):
         self.log_file.write(message + '\n')
-        self.log_file.flush()
+        if self.must_flush(message):
+            self.flush()
 
     def inner_display_error(self, message):
         self.log_file.write(message + '\n')
-        self.log_file.flush()
+        self.flush()
+
+    def inner_flush(self):
+        if self.log_file:
+            self.log_file.flush()
 
     def remove(self):
         """Removes any log file written (useful for tests)."""
         if self.log_file:
             self.log_file.close()
+            self.log_file = None
 
         if os.path.exists(self.log_filename):
             os.remove(self.log_filename)
 
+
+class StructuredDisplay(Display):
+    """
+    This is the Display implementation that outputs machine-parseable NDJSON
+    records (one JSON object per line) rather than prefixed text. Each record
+    tells its timestamp, level, indentation depth and message.
+    """
+
+    def __init__(self, output=None, batch_size=256, verbosity=2, flush_policy=Display.flush_on_error, flush_size=64*1024, flush_period=1.0):
+        """
+        Implements the Display interface so that messages are output as
+        records:
+            - output: the file object records are written to (by default the standard output)
+            - batch_size: maximum number of records written at once
+            - the other parameters have the same semantics as the Display ones
+
+        Records are written in batches, and warning or error ones are written
+        immediately.
+        """
+        self.output = output
+        self.batch = []
+        self.batch_size = batch_size
+        if orjson:
+            self.encode = lambda record: orjson.dumps(record).decode('utf-8')
+        else:
+            self.encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        Display.__init__(self, 0, False, False, verbosity, flush_policy, flush_size, flush_period)
+
+
+    def inner_display(self, level, message, add_return):
+        """Records specified message; add_return is meaningless here."""
+        line = self.encode({'ts': time.time(), 'level': level, 'depth': self.offset // self.offset_increment, 'message': message}) + '\n'
+        self.batch.append(line)
+        if level == self.warning_level or level == self.error_level or len(self.batch) >= self.batch_size or self.must_flush(line):
+            self.flush()
+
+
+    def inner_display_normal(self, message):
+        message = message.rstrip('\n')
+        if message:
+            self.inner_display(self.normal_level, message, True)
+
+
+    def inner_display_error(self, message):
+        message = message.rstrip('\n')
+        if message:
+            self.inner_display(self.error_level, message, True)
+
+
+    def inner_flush(self):
+        output = self.output or sys.stdout
+        if self.batch:
+            output.write(''.join(self.batch))
+            self.batch = []
+        output.flush()
+
+
+
+class QueueDisplay(Display):
+    """
+    This is the Display implementation meant to be used by worker processes:
+    their messages are sent, as records, through the queue of a
+    DisplayCollector, which outputs them from a single place. The indentation
+    is thus managed per worker.
+
+    Workers shall create their QueueDisplay from the queue of the collector,
+    as obtained from their parent process, for example:
+        collector = DisplayCollector(FileDisplay('Log'))
+        pool = multiprocessing.Pool(initializer=my_init, initargs=(collector.queue,))
+    where my_init creates a QueueDisplay(collector_queue).
+    """
+
+    def __init__(self, record_queue, spacing=10, compression=True, truncate=False, verbosity=2):
+        """
+        Implements the Display interface so that messages are sent to the
+        specified queue; the other parameters have the same semantics as the
+        Display ones.
+        """
+        Display.__init__(self, spacing, compression, truncate, verbosity)
+        self.queue = record_queue
+        self.sequence = 0
+
+
+    def inner_display(self, level, message, add_return):
+        """Sends a record corresponding to specified message."""
+        self.sequence += 1
+        self.queue.put((time.time(), os.getpid(), self.sequence, level, self.offset, message, add_return))
+
+
+    def inner_display_normal(self, message):
+        # Raw messages (ex: blank lines) are sent with no level:
+        self.inner_display(None, message, False)
+
+
+    def inner_display_error(self, message):
+        self.inner_display(self.error_level, message, False)
+
+
+
+class DisplayCollector:
+    """
+    Collects the records sent by the QueueDisplay instances of worker
+    processes, and outputs them, in batches and in timestamp order, through
+    the specified (target) display, from a single thread of the parent
+    process. Workers thus neither interleave partial lines nor clobber the
+    same log file.
+    """
+
+    def __init__(self, target_display, context=None, max_batch_size=1000):
+        """
+        Creates a collector outputting through specified display:
+            - context: the multiprocessing context to create the record queue from (by default, the default context)
+            - max_batch_size: maximum number of records output at once
+        """
+        self.target = target_display
+        self.queue = (context or multiprocessing).Queue()
+        self.max_batch_size = max_batch_size
+        self.closed = False
+        self.collector = threading.Thread(target=self.collect_loop, name="DisplayCollector", daemon=True)
+        self.collector.start()
+        atexit.register(close_at_exit, weakref.ref(self))
+
+
+    def collect_loop(self):
+        """Main loop of the collecting thread."""
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if None in batch:
+                running = False
+                batch = [r for r in batch if r is not None]
+
+            # Ordering by timestamp, the records of a given worker being kept
+            # in their sending order:
+            batch.sort(key=lambda r: (r[0], r[1], r[2]))
+
+            target = self.target
+            saved_offset = target.offset
+            for (timestamp, pid, sequence, level, offset, message, add_return) in batch:
+                if level is None:
+                    target.inner_display_normal(message)
+                else:
+                    target.offset = offset
+                    target.inner_display(level, message, add_return)
+            target.offset = saved_offset
+            target.flush()
+
+
+    def close(self):
+        """
+        Stops collecting, once all records already sent are output; workers
+        shall not send records afterwards.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.collector.join()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+class AsyncFileDisplay(FileDisplay):
+    """
+    This is a FileDisplay whose messages are written by a dedicated writer
+    thread: callers only enqueue them, and the writer writes them in batches.
+    The log file may be rotated by size and/or by period, rotated files being
+    then optionally compressed.
+    """
+
+    # Policies applied when the message queue is full:
+    block_when_full = 'block'
+    drop_when_full  = 'drop'
+
+    def __init__(self, log_base_name=FileDisplay.default_log_base_name, allow_overwrite=True, spacing=10, compression=True, truncate=False, verbosity=2, queue_size=10000, full_policy=block_when_full, max_batch_size=1000, rotation_size=None, rotation_period=None, compress_rotated=False):
+        """
+        Implements the FileDisplay interface with a background writer:
+            - queue_size: maximum number of messages waiting to be written
+            - full_policy: tells whether callers shall block, or whether their messages shall be dropped, when the queue is full
+            - max_batch_size: maximum number of messages written at once
+            - rotation_size: size, in bytes, beyond which the log file is rotated (if set; checked between batches)
+            - rotation_period: duration, in seconds, beyond which the log file is rotated (if set)
+            - compress_rotated: tells whether rotated log files shall be gzip-compressed
+            - the other parameters have the same semantics as the FileDisplay ones
+
+        The writer is stopped, once all pending messages are written, by close
+        (called at exit if needed).
+        """
+
+        if not full_policy in [self.block_when_full, self.drop_when_full]:
+            raise GeneralUtilsException("AsyncFileDisplay: unknown queue full policy '%s'." % (full_policy,))
+
+        self.queue = queue.Queue(queue_size)
+        self.full_policy = full_policy
+        self.max_batch_size = max_batch_size
+        self.rotation_size = rotation_size
+        self.rotation_period = rotation_period
+        self.compress_rotated = compress_rotated
+        self.dropped_count = 0
+        self.rotated_count = 0
+        self.closed = False
+
+        FileDisplay.__init__(self, log_base_name, allow_overwrite, spacing, compression, truncate, verbosity)
+
+        self.written_size = self.log_file.tell()
+        self.opened_at = time.monotonic()
+
+        self.writer = threading.Thread(target=self.write_loop, name="AsyncFileDisplay writer for %s" % (self.log_filename,), daemon=True)
+        self.writer.start()
+
+        atexit.register(close_at_exit, weakref.ref(self))
+
+
+    def enqueue(self, item):
+        """Hands specified item to the writer thread."""
+        if self.closed:
+            self.dropped_count += 1
+        elif self.full_policy == self.block_when_full:
+            self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped_count += 1
+
+
+    def inner_display_normal(self, message):
+        self.enqueue(message + '\n')
+
+    def inner_display_error(self, message):
+        self.enqueue(message + '\n')
+
+    def inner_flush(self):
+        """Waits until all messages enqueued so far are written."""
+        if self.closed or threading.current_thread() is self.writer:
+            return
+        done = threading.Event()
+        # Never dropped, otherwise the caller would wait forever:
+        self.queue.put(done)
+        done.wait()
+
+
+    def write_loop(self):
+        """Main loop of the writer thread."""
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            messages = []
+            events = []
+            for item in batch:
+                if item is None:
+                    running = False
+                elif isinstance(item, str):
+                    messages.append(item)
+                else:
+                    events.append(item)
+
+            if messages:
+                self.write_messages(''.join(messages))
+
+            self.log_file.flush()
+
+            for e in events:
+                e.set()
+
+
+    def write_messages(self, text):
+        """Writes specified text, rotating the log file first if needed."""
+        if self.written_size and ((self.rotation_size and self.written_size + len(text) > self.rotation_size) or (self.rotation_period and time.monotonic() - self.opened_at >= self.rotation_period)):
+            self.rotate()
+        self.log_file.write(text)
+        self.written_size += len(text)
+
+
+    def rotate(self):
+        """Rotates the log file, compressing the rotated one if requested."""
+        self.log_file.close()
+
+        self.rotated_count += 1
+        rotated_filename = "%s.%s-%s" % (self.log_filename, time.strftime("%Y%m%d-%H%M%S"), self.rotated_count)
+        os.rename(self.log_filename, rotated_filename)
+
+        if self.compress_rotated:
+            with open(rotated_filename, 'rb') as f_in:
+                with gzip.open(rotated_filename + '.gz', 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            os.remove(rotated_filename)
+
+        self.log_file = open(self.log_filename, 'w')
+        self.written_size = 0
+        self.opened_at = time.monotonic()
+
+
+    def close(self):
+        """
+        Stops the writer thread once all pending messages are written, and
+        closes the log file.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer.join()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+
+    def remove(self):
+        """Removes any log file written (useful for tests)."""
+        self.close()
+        FileDisplay.remove(self)
+
+
+
+def close_at_exit(display_ref):
+    """Closes the referenced display (or collector), if it still exists."""
+    display = display_ref()
+    if display is not None:
+        display.close()
+
+
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print(__doc__)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
 __title__       = "This is the introspection module, made to retrieve easily information about Python elements."
-__version__     = "0.2"
+__version__     = "0.3"
 __author__      = "Olivier Boudeville (olivier.boudeville@online.fr)"
 __project__     = "Ceylan"
 __creationDate__= "2001, August 23"
@@ -11,103 +11,335 @@ __doc__         = __title__ + '\n' + __comments__
 
 
 # Original functions translated from Python 2.1 to Python 1.5.2 and, eventually,
-# back in 2.1!
+# back in 2.1, then to Python 3!
+#
+# Members are looked up statically (inspect.getattr_static), so that no
+# property, descriptor or __getattr__ is triggered by introspection; they are
+# returned lazily, as Member records, the show_* and inspect_* functions being
+# mere displays thereof.
+
+import sys, inspect, weakref, collections
+
+
+# Describes a member of an object:
+#  - name: the name of that member
+#  - kind: see get_member_kind (ex: 'method', 'property', 'data')
+#  - value: the (static) value of that member, ex: the property object itself,
+#    not the result of its evaluation
+#  - owner: the object in which the member is defined (ex: a base class)
+#  - doc: the documentation string of that member, if relevant
+#
+Member = collections.namedtuple('Member', ['name', 'kind', 'value', 'owner', 'doc'])
+
+
+# Describes a function or a method:
+FunctionInfo = collections.namedtuple('FunctionInfo', ['name', 'qualified_name',
+    'doc', 'signature', 'defaults', 'module', 'bound_to', 'defining_class'])
+
+
+# Member kinds that are callable:
+callable_kinds = frozenset(['method', 'function', 'staticmethod', 'classmethod', 'builtin', 'class'])
+
+
+# Denotes a member that does not exist (anymore):
+_missing = object()
+
+
+# Per-type (snapshot, member table) pairs, not preventing the types from being
+# collected; they reference neither their type nor the member values (some of
+# which, like the __dict__ descriptor, reference it), from which Member records
+# are rebuilt. The snapshot, made of the sets of the names defined by each
+# class of the method resolution order, tells whether the table is still
+# valid (ex: once attributes have been added to or deleted from a class):
+#
+_member_tables = weakref.WeakKeyDictionary()
+
+
+
+def get_member_kind(value, in_class=False):
+    """Returns the kind of the specified (static) member value, among
+    'property', 'staticmethod', 'classmethod', 'class', 'module', 'method'
+    (function defined in a class), 'function', 'builtin', 'descriptor' and
+    'data'."""
+
+    if isinstance(value, property):
+        return 'property'
+    if isinstance(value, staticmethod):
+        return 'staticmethod'
+    if isinstance(value, classmethod):
+        return 'classmethod'
+    if inspect.isclass(value):
+        return 'class'
+    if inspect.ismodule(value):
+        return 'module'
+    if inspect.isfunction(value):
+        return in_class and 'method' or 'function'
+    if inspect.ismethod(value):
+        return 'method'
+    if inspect.isbuiltin(value) or inspect.ismethoddescriptor(value):
+        return 'builtin'
+    if inspect.isdatadescriptor(value):
+        return 'descriptor'
+    return 'data'
+
+
+
+def make_member(name, value, owner, in_class=False):
+    """Returns the Member record corresponding to the specified elements."""
+
+    kind = get_member_kind(value, in_class)
+
+    doc = None
+    if kind != 'data':
+        doc = inspect.getdoc(value)
+
+    return Member(name, kind, value, owner, doc)
+
+
+
+def get_member_table(a_type):
+    """Returns the members of the specified type (including inherited ones),
+    as a dictionary associating to their name a (index in the method resolution
+    order of the defining class, kind, doc) triplet; cached per type."""
+
+    mro = inspect.getmro(a_type)
+
+    cached = _member_tables.get(a_type)
+
+    if cached is not None:
+        (snapshot, table) = cached
+        if len(snapshot) == len(mro) and all(vars(klass).keys() == names for (klass, names) in zip(mro, snapshot)):
+            return table
+
+    table = {}
+    # The first definition in the method resolution order prevails:
+    for index, klass in enumerate(mro):
+        for name, value in vars(klass).items():
+            if name not in table:
+                member = make_member(name, value, klass, in_class=True)
+                table[name] = (index, member.kind, member.doc)
+
+    _member_tables[a_type] = ([frozenset(vars(klass)) for klass in mro], table)
+
+    return table
+
+
+
+def make_type_member(a_type, name, entry):
+    """Returns the Member record of the specified type corresponding to the
+    specified name and entry of its member table (None if the member does not
+    exist anymore)."""
+
+    (index, kind, doc) = entry
+    owner = inspect.getmro(a_type)[index]
+
+    value = vars(owner).get(name, _missing)
+    if value is _missing:
+        return None
+
+    return Member(name, kind, value, owner, doc)
+
+
+
+def clear_cache():
+    """Forgets the cached member tables (ex: after classes were modified)."""
+    _member_tables.clear()
+
+
+
+def get_namespaces(my_object):
+    """Returns the (type, type member table, own variables) triplet with which
+    the members of the specified object are to be looked up."""
+
+    if inspect.isclass(my_object):
+        return my_object, get_member_table(my_object), {}
+
+    # Modules are not cached, as all sharing the same type:
+    a_type = None
+    table = {}
+    if not inspect.ismodule(my_object):
+        a_type = type(my_object)
+        table = get_member_table(a_type)
+
+    try:
+        own_vars = vars(my_object)
+    except TypeError:
+        # No __dict__ (ex: built-in values, instances with __slots__):
+        own_vars = {}
+
+    return a_type, table, own_vars
+
+
+
+def select_member(my_object, name, a_type, table, own_vars):
+    """Returns the Member record of the specified name, from the specified
+    namespaces of the specified object (None if not found)."""
+
+    entry = table.get(name)
+
+    # Data descriptors (ex: properties) of the type prevail over the instance
+    # dictionary:
+    #
+    if name in own_vars and (entry is None or entry[1] not in ('property', 'descriptor')):
+        return make_member(name, own_vars[name], my_object)
+
+    if entry is None:
+        return None
+
+    return make_type_member(a_type, name, entry)
+
+
+
+def iter_members(my_object, kinds=None, include_private=True):
+    """Yields lazily, sorted by name, the Member records of the specified
+    object (module, class or instance), possibly only those of the specified
+    kinds, and/or only the public ones."""
+
+    a_type, table, own_vars = get_namespaces(my_object)
+
+    for name in sorted(set(table) | set(own_vars)):
+
+        if not include_private and name.startswith('_'):
+            continue
+
+        member = select_member(my_object, name, a_type, table, own_vars)
+
+        if member is not None and (kinds is None or member.kind in kinds):
+            yield member
+
+
+
+def get_member(my_object, name):
+    """Returns the Member record corresponding to the specified name of the
+    specified object, looked up statically; raises AttributeError if there is
+    no such member."""
+
+    a_type, table, own_vars = get_namespaces(my_object)
+
+    member = select_member(my_object, name, a_type, table, own_vars)
+
+    if member is None:
+        # Ex: members provided by the metaclass of a class:
+        member = make_member(name, inspect.getattr_static(my_object, name), type(my_object))
+
+    return member
+
+
+
+def describe_function(my_func):
+    """Returns a FunctionInfo record describing the specified function or
+    (bound) method."""
+
+    bound_to = getattr(my_func, '__self__', None)
+    if inspect.ismodule(bound_to):
+        # Built-in functions are bound to their module:
+        bound_to = None
+
+    func = getattr(my_func, '__func__', my_func)
+
+    defining_class = None
+    if bound_to is not None:
+        # For class methods, bound to the class itself:
+        defining_class = inspect.isclass(bound_to) and bound_to or type(bound_to)
+
+    try:
+        signature = str(inspect.signature(my_func))
+    except (TypeError, ValueError):
+        signature = None
+
+    return FunctionInfo(name=func.__name__,
+                        qualified_name=getattr(func, '__qualname__', func.__name__),
+                        doc=inspect.getdoc(func),
+                        signature=signature,
+                        defaults=getattr(func, '__defaults__', None),
+                        module=getattr(func, '__module__', None),
+                        bound_to=bound_to,
+                        defining_class=defining_class)
+
+
+
+def format_value(value, collapse=1):
+    """Returns a one-line (if collapse is set) textual representation of the
+    specified value."""
+
+    text = str(value)
+    if collapse:
+        text = ' '.join(text.split())
+    return text
 
-import sys, string, inspect, toolbox
 
 
 def show_dict(my_dict, spacing=10, collapse=1):
     """Displays a dictionnary in a user-friendly fashion, each line showing a key and its related object"""
-    tmp_list = []
-    for item in my_dict.keys():
-        tmp_list.append("%s %s" % (item.ljust(spacing), my_dict[item]))
-    print( string.join(tmp_list, '\n') )
+    print('\n'.join(["%s %s" % (str(key).ljust(spacing), format_value(value, collapse)) for key, value in my_dict.items()]))
 
 
 def show_methods(object, spacing=15, collapse=1):
     """Prints methods and doc strings of object"""
-
-    method_list = []
-    for method in dir(object):
-        if callable(getattr(object, method)):
-            method_list.append(method)
-    tmp_list = []
-    for method in method_list:
-        tmp_list.append("%s %s" % (method.ljust(spacing),str(getattr(object, method).__doc__)))
-    print( string.join(tmp_list, '\n'))
+    print('\n'.join(["%s %s" % (member.name.ljust(spacing), format_value(member.doc, collapse)) for member in iter_members(object, callable_kinds)]))
 
 
 def show_data_members(object, spacing=10, collapse=1):
-    """Prints data members of object, with their type"""
-
-    data_list = []
-    for member in dir(object):
-        if not callable(getattr(object, member)):
-            data_list.append(member)
-    tmp_list = []
-    for member in data_list:
-        tmp_list.append("%s %s %s" % (member.ljust(spacing), type(member), str(member)))
+    """Prints data members of object, with their kind and type"""
+    tmp_list = ["%s %s %s" % (member.name.ljust(spacing), member.kind, type(member.value).__name__) for member in iter_members(object) if member.kind not in callable_kinds]
     if tmp_list:
-        print( string.join(tmp_list, '\n'))
+        print('\n'.join(tmp_list))
     else:
-        print( "No data attributes")
+        print("No data attributes")
 
 
 def show_loaded_modules(spacing=10, collapse=1):
     """Prints the loaded modules"""
-
-    tmp_list=[]
-    for item in sys.modules.keys():
-        tmp_list.append("%s %s" % (item.ljust(spacing), sys.modules[item]))
-    print( string.join(tmp_list, '\n'))
+    show_dict(dict(sys.modules), spacing, collapse)
 
 
 def show_object_symbol_table(my_object):
     """Displays the local object symbol table"""
-    show_dict( vars(my_object) )
+    show_dict(vars(my_object))
 
 
 def show_current_local_symbol_table(spacing=10, collapse=1):
-    """Shows current local symbol table, with their type"""
-    tmp_list=[]
-    for item in dir():
-        tmp_list.append("%s %s" % (item.ljust(spacing), type(item)))
-    print( string.join(tmp_list, '\n'))
+    """Shows the local symbol table of the caller, with their type"""
+    caller_locals = sys._getframe(1).f_locals
+    print('\n'.join(["%s %s" % (name.ljust(spacing), type(value).__name__) for name, value in caller_locals.items()]))
 
 
 def inspect_module(my_module, spacing=10, collapse=1):
     """Displays information regarding a module"""
-    print( "Module description: ", my_module.__doc__)
-    if my_module.__file__ is not None:
-        print( "Defined in file '%s'" % my_module.__file__)
-    tmp_list = []
+    print("Module description: ", my_module.__doc__)
+    if getattr(my_module, '__file__', None) is not None:
+        print("Defined in file '%s'" % my_module.__file__)
     print("Module members:")
-    process_func = collapse and (lambda s: string.join(s.split(), ' ')) or (lambda s: s)
-    print( "\n".join(["%s %s" % (item[0].ljust(spacing), process_func(str(item[1]))) for item in inspect.getmembers(my_module)]))
+    for member in iter_members(my_module):
+        print("%s %s" % (member.name.ljust(spacing), format_value(member.value, collapse)))
 
 
 def inspect_class(my_class, spacing=10, collapse=1):
     """Displays information regarding a class"""
-    print( "Class description: ", my_class.__doc__)
-    print( "Defined in module: ", my_class.__module__)
+    print("Class description: ", my_class.__doc__)
+    print("Defined in module: ", my_class.__module__)
+    print("Base classes: ", ', '.join([base.__name__ for base in my_class.__bases__]))
 
 
 def inspect_method(my_method, spacing=15, collapse=1):
     """Displays information regarding a method"""
-    print( "Name: ", my_method.__name__ )
-    print( "Method description: ", my_method.__doc__ )
-    print( "Belonging to class: ", my_method.im_class )
-    print( "Function-object containing this method: ", my_method.im_func )
-    if my_method.im_self is not None:
-        print( "Linked to instance: ", im_self )
+    info = describe_function(my_method)
+    print("Name: ", info.name)
+    print("Method description: ", info.doc)
+    print("Belonging to class: ", info.defining_class)
+    print("Function-object containing this method: ", getattr(my_method, '__func__', my_method))
+    if info.bound_to is not None:
+        print("Linked to instance: ", info.bound_to)
 
 
 def inspect_function(my_func, spacing=10, collapse=1):
     """Displays information regarding a function"""
-    print( "Name: ", my_func.__name__ )
-    print( "Function description: ", my_func.__doc__ )
-    print( "Default arguments: ", my_func.func_defaults )
-    print( "Global namespace of defintion: ", myfunc.func_globals )
+    info = describe_function(my_func)
+    print("Name: ", info.name)
+    print("Function description: ", info.doc)
+    print("Signature: ", info.signature)
+    print("Default arguments: ", info.defaults)
+    print("Defined in module: ", info.module)
 
 
 
@@ -1,15 +1,96 @@
 #!/usr/bin/python3
 
-import json
-
-input_filepath="messages.ndjson"
-output_filepath="messages.json"
-
-with open(output_filepath, 'w') as f_out:
-    with open(input_filepath, 'r') as f_in:
-        ndjson_content = f_in.read()
-        for ndjson_line in ndjson_content.splitlines():
-            if not ndjson_line.strip():
-                continue  # ignore empty lines
-            json_line = json.loads(ndjson_line)
-            json.dump(json_line, f_out)
+"""
+Converts a NDJSON (newline-delimited JSON) file into a JSON one, holding the
+array of its records. The conversion is streamed: memory use does not depend
+on the size of the files.
+
+Records may be filtered (--where) and projected (--select); these stages are
+applied in the order they are specified, so that they can be chained.
+
+Instead of a JSON file, records may be exported as typed column files
+(--columns), which can be memory-mapped for analytics.
+
+Records can also be accessed directly thanks to a side-car line index (--show),
+and long conversions can be resumed after an interruption (--checkpoint).
+"""
+
+import sys, argparse
+
+import ndjson_utils
+
+
+class StageAction(argparse.Action):
+    """Appends the stage corresponding to an option to the common list."""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        try:
+            if option_string == '--where':
+                stage = ndjson_utils.parse_filter(values)
+            else:
+                stage = ndjson_utils.parse_projection(values)
+        except ndjson_utils.NdjsonUtilsException as e:
+            parser.error(str(e))
+        namespace.stages = (namespace.stages or []) + [stage]
+
+
+def show_records(input_path, output_path, rank_range):
+    """
+    Outputs the records whose ranks are in specified range (ex: '12' or
+    '100:200'), thanks to the line index of the input.
+    """
+    bounds = rank_range.split(':')
+    try:
+        start = int(bounds[0])
+        stop = start + 1
+        if len(bounds) > 1:
+            stop = int(bounds[1])
+    except ValueError:
+        sys.exit("Error, invalid record range '%s'." % (rank_range,))
+
+    with ndjson_utils.open_index(input_path) as index:
+        f_out = ndjson_utils.open_output(output_path)
+        for n in range(*slice(start, stop).indices(len(index))):
+            f_out.write(index.get_line(n) + b'\n')
+        f_out.flush()
+        if output_path != '-':
+            f_out.close()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('input', nargs='?', default='-', help="the NDJSON file to convert, possibly gzip-compressed ('-', the default, for the standard input)")
+
+    parser.add_argument('output', nargs='?', default='-', help="the JSON file to write ('-', the default, for the standard output)")
+
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="the number of worker processes decoding the input in parallel, if it is a regular, uncompressed file (0 for one per core; default: 1)")
+
+    parser.add_argument('--where', dest='stages', action=StageAction, metavar='FILTER', help="keep only the records matching FILTER, among FIELD=VALUE, FIELD!=VALUE and FIELD~TEXT (substring); FIELD may be a dotted path, VALUE is read as JSON if possible")
+
+    parser.add_argument('--select', dest='stages', action=StageAction, metavar='FIELDS', help="project the records onto the specified comma-separated fields")
+
+    parser.add_argument('--columns', metavar='DIR', help="export the records as column files in directory DIR, along with their schema, instead of writing a JSON file")
+
+    parser.add_argument('--sample-size', type=int, default=ndjson_utils.default_sample_size, help="the number of first records used to infer the column types (default: %(default)s)")
+
+    parser.add_argument('--checkpoint', metavar='FILE', help="store the progress of the conversion in FILE, and resume from it if it exists (for regular, uncompressed files)")
+
+    parser.add_argument('--show', metavar='START[:STOP]', help="output, as NDJSON, the records of the specified rank(s), thanks to a line index (built if needed) rather than by scanning the input")
+
+    args = parser.parse_args()
+
+    try:
+        if args.show:
+            show_records(args.input, args.output, args.show)
+        elif args.columns:
+            ndjson_utils.export_columns(args.input, args.columns, args.stages or (), args.sample_size)
+        else:
+            ndjson_utils.convert_to_json(args.input, args.output, args.jobs, stages=args.stages or (), checkpoint_path=args.checkpoint)
+    except (OSError, ndjson_utils.NdjsonUtilsException) as e:
+        sys.exit("Error, conversion failed: %s" % (e,))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1037 @@
+#!/usr/bin/env python
+
+__title__       = 'This module helps processing NDJSON (newline-delimited JSON) files, in a streaming fashion.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = "Files are read line by line, in large buffered chunks, so that memory use does not depend on their size. The '-' path designates the standard input or output, and gzip-compressed inputs are detected automatically."
+__source__      = 'None'
+__doc__         = __title__ + '\n' + __comments__
+
+
+# Import standard python modules:
+import sys, os, io, re, gzip, json, mmap, array, struct, collections, concurrent.futures
+
+# Optional, used to memory-map columns:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Import home-made modules:
+from general_utils import GeneralUtilsException
+
+
+class NdjsonUtilsException(GeneralUtilsException):
+    """Base class for ndjson_utils exceptions."""
+
+
+# Size, in bytes, of the buffers used for reading and writing:
+buffer_size = 1024 * 1024
+
+gzip_magic = b'\x1f\x8b'
+
+# Default size, in bytes, of the chunks processed in parallel:
+default_chunk_size = 16 * 1024 * 1024
+
+
+
+def is_gzip_file(path):
+    """Returns true if and only if specified file is gzip-compressed."""
+    with open(path, 'rb') as f:
+        return f.read(2) == gzip_magic
+
+
+
+def open_input(path):
+    """
+    Returns a binary, buffered file object to read specified NDJSON input,
+    decompressing it if needed; '-' designates the standard input.
+    """
+    if path == '-':
+        f = sys.stdin.buffer
+        if f.peek(2)[:2] == gzip_magic:
+            return io.BufferedReader(gzip.GzipFile(fileobj=f), buffer_size)
+        return f
+
+    if is_gzip_file(path):
+        return io.BufferedReader(gzip.open(path, 'rb'), buffer_size)
+
+    return open(path, 'rb', buffering=buffer_size)
+
+
+
+def open_output(path):
+    """
+    Returns a binary, buffered file object to write specified output; '-'
+    designates the standard output.
+    """
+    if path == '-':
+        return sys.stdout.buffer
+    return open(path, 'wb', buffering=buffer_size)
+
+
+
+def encode_record(record):
+    """Returns the JSON serialisation, as bytes, of specified record."""
+    return json.dumps(record).encode('utf-8')
+
+
+
+def decode_line(line, location):
+    """
+    Returns the record corresponding to specified NDJSON line, whose location
+    (ex: 'line 12') is specified for error reporting.
+    """
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise NdjsonUtilsException("Invalid JSON at %s: %s." % (location, e))
+
+
+
+def iter_records(f_in):
+    """
+    Yields, one by one, the records read from specified binary file object;
+    empty lines are ignored.
+    """
+    line_number = 0
+    for line in f_in:
+        line_number += 1
+        if not line.strip():
+            continue
+        yield decode_line(line, "line %s" % (line_number,))
+
+
+
+# Record filtering and projection.
+#
+# Records can be processed by a chain of stages, each of them either filtering
+# them (RecordFilter) or projecting them onto a subset of their fields
+# (RecordProjection). Fields are designated by paths, whose dot-separated
+# elements are keys of nested objects (ex: 'author.name').
+#
+# Before a line is decoded, the filters check that its raw bytes contain the
+# (JSON-encoded) key and value they look for, so that most non-matching lines
+# are never decoded. This pre-filtering is skipped for the terms that could be
+# legitimately escaped in JSON (non-ASCII characters, slashes, etc.).
+
+# A value that cannot be found in records:
+missing = object()
+
+# Characters that JSON producers do not escape in strings (unlike '<', '>' and
+# '&', escaped for example by Go as \u003c, \u003e and \u0026):
+unescaped_pattern = re.compile(r"^[A-Za-z0-9 _.,:;\-+*=#@!?()\[\]{}|%$^~']*$")
+
+
+
+def get_field(record, path):
+    """
+    Returns the value found in specified record at specified (dotted) path,
+    or missing.
+    """
+    for key in path.split('.'):
+        if not isinstance(record, dict):
+            return missing
+        record = record.get(key, missing)
+        if record is missing:
+            return missing
+    return record
+
+
+
+def set_field(record, path, value):
+    """Sets specified value in specified record at specified (dotted) path."""
+    keys = path.split('.')
+    for key in keys[:-1]:
+        record = record.setdefault(key, {})
+    record[keys[-1]] = value
+
+
+
+def get_raw_term(text):
+    """
+    Returns the bytes that shall appear verbatim in the raw JSON line holding
+    specified string, or None if they cannot be determined reliably.
+    """
+    if unescaped_pattern.match(text):
+        return text.encode('ascii')
+    return None
+
+
+
+class RecordFilter:
+    """
+    Keeps only the records whose field at the specified path compares
+    successfully to the specified value, the operator being:
+     - '=': the field equals the value
+     - '!=': the field is missing or differs from the value
+     - '~': the field is a string containing the value
+    """
+
+    operators = ['=', '!=', '~']
+
+    def __init__(self, path, operator, value):
+        if not operator in self.operators:
+            raise NdjsonUtilsException("Unknown filter operator '%s'." % (operator,))
+        self.path = path
+        self.operator = operator
+        self.value = value
+
+        # Byte strings that a raw line must contain in order to match:
+        self.raw_terms = []
+
+        if operator != '!=':
+            key_term = get_raw_term(path.split('.')[-1])
+            if key_term is not None:
+                self.raw_terms.append(b'"' + key_term + b'"')
+            value_term = None
+            if operator == '~':
+                value_term = get_raw_term(value)
+            elif isinstance(value, str):
+                value_term = get_raw_term(value)
+                if value_term is not None:
+                    value_term = b'"' + value_term + b'"'
+            elif value is None or isinstance(value, bool):
+                # Numbers may be written in various ways (ex: 1e2):
+                value_term = json.dumps(value).encode('ascii')
+            if value_term:
+                self.raw_terms.append(value_term)
+
+
+    def may_match(self, line):
+        """
+        Tells whether specified raw (undecoded) line may hold a matching
+        record; if false, it does not.
+        """
+        for term in self.raw_terms:
+            if not term in line:
+                return False
+        return True
+
+
+    def apply(self, record):
+        """Returns specified record if it matches, otherwise None."""
+        field = get_field(record, self.path)
+        if self.operator == '=':
+            matched = field is not missing and field == self.value
+        elif self.operator == '!=':
+            matched = field is missing or field != self.value
+        else:
+            matched = isinstance(field, str) and self.value in field
+        if matched:
+            return record
+        return None
+
+
+
+class RecordProjection:
+    """
+    Projects records onto the fields at the specified paths, the missing ones
+    being omitted.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+
+
+    def may_match(self, line):
+        return True
+
+
+    def apply(self, record):
+        """Returns the projection of specified record."""
+        res = {}
+        for path in self.paths:
+            value = get_field(record, path)
+            if value is not missing:
+                set_field(res, path, value)
+        return res
+
+
+
+filter_pattern = re.compile(r'^([^=!~]+)(!=|=|~)(.*)$', re.DOTALL)
+
+
+
+def parse_filter(expression):
+    """
+    Returns the RecordFilter corresponding to specified expression, such as
+    'status="sent"', 'count=3', 'author.name!=bob' or 'text~urgent'. Values
+    are read as JSON if possible, otherwise as plain strings; those of the '~'
+    operator are always plain strings.
+    """
+    match = filter_pattern.match(expression)
+    if not match:
+        raise NdjsonUtilsException("Invalid filter expression '%s' (expecting FIELD=VALUE, FIELD!=VALUE or FIELD~TEXT)." % (expression,))
+    (path, operator, value) = match.groups()
+    if operator != '~':
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+    return RecordFilter(path.strip(), operator, value)
+
+
+
+def parse_projection(expression):
+    """
+    Returns the RecordProjection corresponding to specified comma-separated
+    list of field paths.
+    """
+    paths = [p.strip() for p in expression.split(',') if p.strip()]
+    if not paths:
+        raise NdjsonUtilsException("Invalid projection '%s' (expecting a comma-separated list of fields)." % (expression,))
+    return RecordProjection(paths)
+
+
+
+def process_record(line, location, stages=()):
+    """
+    Returns the record held by specified (non-empty) raw line once processed
+    by specified stages, or None if it has been filtered out.
+    """
+    for stage in stages:
+        if not stage.may_match(line):
+            return None
+    record = decode_line(line, location)
+    for stage in stages:
+        record = stage.apply(record)
+        if record is None:
+            return None
+    return record
+
+
+
+def process_line(line, location, stages=()):
+    """
+    Returns the serialisation, as bytes, of the record held by specified
+    (non-empty) raw line once processed by specified stages, or None if it has
+    been filtered out.
+    """
+    record = process_record(line, location, stages)
+    if record is None:
+        return None
+    return encode_record(record)
+
+
+
+class JsonArrayWriter:
+    """
+    Writes incrementally a JSON array, element after element, to a binary file
+    object.
+    """
+
+    def __init__(self, f_out, resumed_count=None):
+        """
+        Starts the array, unless resuming the writing of an array already
+        holding specified number of records.
+        """
+        self.f_out = f_out
+        if resumed_count is None:
+            self.count = 0
+            f_out.write(b'[')
+        else:
+            self.count = resumed_count
+
+
+    def write_encoded(self, encoded_record):
+        """Appends specified, already serialised, record to the array."""
+        if self.count:
+            self.f_out.write(b',\n')
+        else:
+            self.f_out.write(b'\n')
+        self.f_out.write(encoded_record)
+        self.count += 1
+
+
+    def write_encoded_block(self, encoded_block, count):
+        """
+        Appends specified block of already serialised records, separated by
+        ',\\n', holding specified number of records.
+        """
+        if not count:
+            return
+        self.write_encoded(encoded_block)
+        self.count += count - 1
+
+
+    def write(self, record):
+        """Appends specified record to the array."""
+        self.write_encoded(encode_record(record))
+
+
+    def close(self):
+        """Terminates the array; the file object is not closed."""
+        if self.count:
+            self.f_out.write(b'\n')
+        self.f_out.write(b']\n')
+        self.f_out.flush()
+
+
+
+def split_into_chunks(path, chunk_size=default_chunk_size):
+    """
+    Returns a list of (start, end) byte ranges covering specified file, each
+    of roughly specified size and ending at a line boundary.
+    """
+    size = os.path.getsize(path)
+    chunks = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            else:
+                end = size
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+
+def convert_chunk(task):
+    """
+    Decodes, processes by the specified stages and re-encodes the records
+    found in the specified byte range of specified file; returns a (block of
+    encoded records separated by ',\\n', record count) pair. Meant to be run
+    in a worker process.
+    """
+    (path, start, end, stages) = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    encoded = []
+    for (index, line) in enumerate(data.split(b'\n')):
+        if not line.strip():
+            continue
+        location = "line %s of the chunk starting at byte %s" % (index + 1, start)
+        res = process_line(line, location, stages)
+        if res is not None:
+            encoded.append(res)
+    return (b',\n'.join(encoded), len(encoded))
+
+
+
+def iter_chunk_results(path, chunk_function, jobs, chunk_size=default_chunk_size, extra_args=()):
+    """
+    Splits specified file into chunks, applies in a pool of specified number
+    of worker processes the specified function to the (path, start, end,
+    *extra_args) task of each chunk, and yields the results in file order. The
+    number of tasks in flight is bounded, so that memory use does not depend
+    on the file size.
+    """
+    chunks = split_into_chunks(path, chunk_size)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for (start, end) in chunks:
+            pending.append(executor.submit(chunk_function, (path, start, end) + tuple(extra_args)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+
+def can_split(path, chunk_size=default_chunk_size):
+    """
+    Tells whether specified input is worth being processed in parallel, i.e.
+    whether it is a regular, uncompressed file spanning multiple chunks.
+    """
+    return path != '-' and os.path.isfile(path) and os.path.getsize(path) > chunk_size and not is_gzip_file(path)
+
+
+
+def read_checkpoint(checkpoint_path, input_path, output_path):
+    """
+    Returns the checkpoint stored in specified file, if it exists and applies
+    to specified input and output, otherwise None.
+    """
+    if not os.path.isfile(checkpoint_path):
+        return None
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('input') != os.path.abspath(input_path) or checkpoint.get('output') != os.path.abspath(output_path):
+        return None
+    return checkpoint
+
+
+
+def write_checkpoint(checkpoint_path, checkpoint):
+    """Stores atomically specified checkpoint in specified file."""
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, checkpoint_path)
+
+
+
+def convert_to_json(input_path, output_path, jobs=1, chunk_size=default_chunk_size, stages=(), checkpoint_path=None, checkpoint_interval=100000):
+    """
+    Converts specified NDJSON input into a JSON file containing the array of
+    its records, in a single streaming pass, once processed by the specified
+    filtering and projection stages (if any). Returns the number of records
+    written.
+
+    If more than one job is requested (0 meaning one per core) and the input
+    is a large enough regular file, it is split into chunks that are decoded
+    in parallel; the output is the same as with a sequential conversion.
+
+    If a checkpoint file is specified (for sequential conversions between
+    regular, uncompressed files), the progress of the conversion is stored in
+    it every checkpoint_interval lines, and an interrupted conversion is
+    resumed from it, provided the same options are used; it is removed once
+    the conversion is over.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+
+    if checkpoint_path and (input_path == '-' or output_path == '-' or is_gzip_file(input_path)):
+        raise NdjsonUtilsException("Checkpoints require regular, uncompressed input and output files.")
+
+    parallel = jobs > 1 and not checkpoint_path and can_split(input_path, chunk_size)
+
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = read_checkpoint(checkpoint_path, input_path, output_path)
+
+    f_in = None
+    if not parallel:
+        f_in = open_input(input_path)
+    try:
+        if checkpoint:
+            f_out = open(output_path, 'r+b', buffering=buffer_size)
+            f_out.seek(checkpoint['output_offset'])
+            f_out.truncate()
+            f_in.seek(checkpoint['input_offset'])
+        else:
+            f_out = open_output(output_path)
+        try:
+            if checkpoint:
+                writer = JsonArrayWriter(f_out, checkpoint['count'])
+            else:
+                writer = JsonArrayWriter(f_out)
+            if parallel:
+                for (block, count) in iter_chunk_results(input_path, convert_chunk, jobs, chunk_size, (tuple(stages),)):
+                    writer.write_encoded_block(block, count)
+            else:
+                line_number = 0
+                input_offset = 0
+                if checkpoint:
+                    line_number = checkpoint['line_number']
+                    input_offset = checkpoint['input_offset']
+                for line in f_in:
+                    line_number += 1
+                    input_offset += len(line)
+                    if line.strip():
+                        res = process_line(line, "line %s" % (line_number,), stages)
+                        if res is not None:
+                            writer.write_encoded(res)
+                    if checkpoint_path and not line_number % checkpoint_interval:
+                        f_out.flush()
+                        write_checkpoint(checkpoint_path, {'input': os.path.abspath(input_path), 'output': os.path.abspath(output_path), 'line_number': line_number, 'input_offset': input_offset, 'output_offset': f_out.tell(), 'count': writer.count})
+            writer.close()
+        finally:
+            if output_path != '-':
+                f_out.close()
+    finally:
+        if f_in and input_path != '-':
+            f_in.close()
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return writer.count
+
+
+
+# Columnar export.
+#
+# Records (JSON objects) can be exported, in a single streaming pass, into a
+# directory of column files, so that later reads of a column cost I/O
+# proportional to that column only. The type of each top-level field is
+# inferred from a sample of the first records, and stored in a 'schema.json'
+# manifest. Column files hold little-endian values that can be memory-mapped
+# (ex: by numpy.memmap), one per record:
+#  - 'int64', 'float64' and 'bool' (one byte) columns have a single data file
+#  - 'string' and 'json' (JSON-encoded values, for arrays, objects and fields
+#    of mixed types) columns have a data file of UTF-8 bytes and an offset file
+#    of record_count + 1 uint64 offsets into it
+# Each column also has a validity file, holding one byte per record, 0 when
+# the value is missing, null or does not match the column type.
+
+schema_filename = 'schema.json'
+
+default_sample_size = 1000
+
+# Number of records buffered before being written to the column files:
+column_batch_size = 64 * 1024
+
+# Keys are column types, values are the array typecode of their data:
+column_typecodes = {'int64': 'q', 'float64': 'd', 'bool': 'B', 'string': 'B', 'json': 'B'}
+
+# Keys are column types, values are their numpy dtype:
+column_dtypes = {'int64': '<i8', 'float64': '<f8', 'bool': '|u1'}
+
+
+
+def infer_type(values):
+    """Returns the column type best suited to the specified sample values."""
+    kinds = set()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            kinds.add('bool')
+        elif isinstance(v, int):
+            kinds.add('int64')
+        elif isinstance(v, float):
+            kinds.add('float64')
+        elif isinstance(v, str):
+            kinds.add('string')
+        else:
+            kinds.add('json')
+    if not kinds:
+        return 'string'
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds == set(['int64', 'float64']):
+        return 'float64'
+    return 'json'
+
+
+
+def write_array(f, values):
+    """Writes specified array to specified file, in little-endian order."""
+    if sys.byteorder == 'big':
+        values.byteswap()
+    values.tofile(f)
+
+
+
+class ColumnWriter:
+    """Writes the files of a column, record after record."""
+
+    int64_range = (-2**63, 2**63 - 1)
+
+    def __init__(self, directory, name, column_type, rank):
+        self.name = name
+        self.type = column_type
+        base = os.path.join(directory, 'column-%04d' % (rank,))
+        self.files = {'data': base + '.data', 'valid': base + '.valid'}
+        if column_type in ['string', 'json']:
+            self.files['offsets'] = base + '.offsets'
+        self.data_file = open(self.files['data'], 'wb')
+        self.valid_file = open(self.files['valid'], 'wb')
+        self.offsets_file = None
+        self.offset = 0
+        if 'offsets' in self.files:
+            self.offsets_file = open(self.files['offsets'], 'wb')
+            self.offsets = array.array('Q', [0])
+        self.data = array.array(column_typecodes[column_type])
+        self.valid = array.array('B')
+        self.invalid_count = 0
+
+
+    def convert(self, value):
+        """
+        Returns the value to store for specified one, or None if it does not
+        fit this column.
+        """
+        t = self.type
+        if value is None:
+            return None
+        if t == 'string':
+            if isinstance(value, str):
+                return value.encode('utf-8')
+        elif t == 'json':
+            return json.dumps(value).encode('utf-8')
+        elif isinstance(value, bool):
+            if t == 'bool':
+                return value
+        elif t == 'int64':
+            if isinstance(value, int) and self.int64_range[0] <= value <= self.int64_range[1]:
+                return value
+        elif t == 'float64':
+            if isinstance(value, (int, float)):
+                return float(value)
+        return None
+
+
+    def append(self, value):
+        """Appends specified value (possibly missing) to this column."""
+        if value is missing:
+            converted = None
+        else:
+            converted = self.convert(value)
+            if converted is None and value is not None:
+                self.invalid_count += 1
+        value = converted
+        if value is None:
+            self.valid.append(0)
+            if self.offsets_file:
+                self.offsets.append(self.offset)
+            else:
+                self.data.append(0)
+        else:
+            self.valid.append(1)
+            if self.offsets_file:
+                self.data.frombytes(value)
+                self.offset += len(value)
+                self.offsets.append(self.offset)
+            else:
+                self.data.append(value)
+        if len(self.valid) >= column_batch_size:
+            self.write_pending()
+
+
+    def write_pending(self):
+        write_array(self.data_file, self.data)
+        write_array(self.valid_file, self.valid)
+        self.data = array.array(self.data.typecode)
+        self.valid = array.array('B')
+        if self.offsets_file:
+            write_array(self.offsets_file, self.offsets)
+            self.offsets = array.array('Q')
+
+
+    def close(self):
+        self.write_pending()
+        for f in [self.data_file, self.valid_file, self.offsets_file]:
+            if f:
+                f.close()
+
+
+    def get_description(self):
+        """Returns the description of this column, for the schema."""
+        return {'name': self.name, 'type': self.type, 'files': dict((k, os.path.basename(v)) for (k, v) in self.files.items()), 'invalid_count': self.invalid_count}
+
+
+
+def export_columns(input_path, directory, stages=(), sample_size=default_sample_size):
+    """
+    Exports the records of specified NDJSON input, once processed by the
+    specified stages, as column files in specified directory (created if
+    needed), in a single streaming pass; the column types are inferred from
+    the first sample_size records. Returns the number of records exported.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    f_in = open_input(input_path)
+
+    try:
+        records = iter_processed_records(f_in, stages)
+
+        sample = []
+        for record in records:
+            sample.append(record)
+            if len(sample) >= sample_size:
+                break
+
+        # Keys are field names, values are their sampled values:
+        fields = {}
+        for record in sample:
+            for (k, v) in record.items():
+                fields.setdefault(k, []).append(v)
+
+        writers = [ColumnWriter(directory, name, infer_type(values), rank) for (rank, (name, values)) in enumerate(fields.items())]
+
+        ignored_fields = set()
+        count = 0
+
+        try:
+            for source in [sample, records]:
+                for record in source:
+                    for w in writers:
+                        w.append(record.get(w.name, missing))
+                    # Records may have as many fields yet different ones:
+                    if not record.keys() <= fields.keys():
+                        ignored_fields.update(record.keys() - fields.keys())
+                    count += 1
+        finally:
+            for w in writers:
+                w.close()
+
+    finally:
+        if input_path != '-':
+            f_in.close()
+
+    schema = {'record_count': count, 'columns': [w.get_description() for w in writers], 'ignored_fields': sorted(ignored_fields)}
+
+    with open(os.path.join(directory, schema_filename), 'w') as f:
+        json.dump(schema, f, indent=2)
+
+    return count
+
+
+
+def iter_processed_records(f_in, stages=()):
+    """
+    Yields, one by one, the records (objects only) read from specified binary
+    file object, once processed by the specified stages.
+    """
+    line_number = 0
+    for line in f_in:
+        line_number += 1
+        if not line.strip():
+            continue
+        record = process_record(line, "line %s" % (line_number,), stages)
+        if isinstance(record, dict):
+            yield record
+
+
+
+def load_schema(directory):
+    """Returns the schema of the columns exported in specified directory."""
+    with open(os.path.join(directory, schema_filename)) as f:
+        return json.load(f)
+
+
+
+def map_file(path, dtype, typecode):
+    """
+    Returns the content of specified file as a read-only numpy memory-mapped
+    array of specified dtype if numpy is available, otherwise as an array of
+    specified typecode.
+    """
+    if numpy is not None:
+        if not os.path.getsize(path):
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.memmap(path, dtype=dtype, mode='r')
+    values = array.array(typecode)
+    with open(path, 'rb') as f:
+        values.frombytes(f.read())
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+
+class StringColumn:
+    """
+    A read-only, memory-mapped 'string' or 'json' column, decoding its values
+    on access; missing values are returned as None.
+    """
+
+    def __init__(self, directory, description):
+        files = description['files']
+        self.is_json = description['type'] == 'json'
+        self.offsets = map_file(os.path.join(directory, files['offsets']), '<u8', 'Q')
+        self.valid = map_file(os.path.join(directory, files['valid']), '|u1', 'B')
+        self.file = open(os.path.join(directory, files['data']), 'rb')
+        self.data = b''
+        if os.path.getsize(self.file.name):
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    def __len__(self):
+        return len(self.valid)
+
+
+    def __getitem__(self, index):
+        if not self.valid[index]:
+            return None
+        value = self.data[int(self.offsets[index]):int(self.offsets[index + 1])].decode('utf-8')
+        if self.is_json:
+            return json.loads(value)
+        return value
+
+
+
+def load_column(directory, name):
+    """
+    Returns the values of the column of specified name exported in specified
+    directory: a memory-mapped numpy array for numerical and boolean columns
+    (a plain array if numpy is not available), otherwise a StringColumn. The
+    values of the invalid records are zero in numerical columns (see
+    load_validity).
+    """
+    for description in load_schema(directory)['columns']:
+        if description['name'] == name:
+            t = description['type']
+            if t in column_dtypes:
+                return map_file(os.path.join(directory, description['files']['data']), column_dtypes[t], column_typecodes[t])
+            return StringColumn(directory, description)
+    raise NdjsonUtilsException("No column '%s' in '%s'." % (name, directory))
+
+
+
+def load_validity(directory, name):
+    """
+    Returns the validity of the values of the column of specified name, one
+    byte (1 if valid, 0 otherwise) per record.
+    """
+    for description in load_schema(directory)['columns']:
+        if description['name'] == name:
+            return map_file(os.path.join(directory, description['files']['valid']), '|u1', 'B')
+    raise NdjsonUtilsException("No column '%s' in '%s'." % (name, directory))
+
+
+
+# Random-access line index.
+#
+# A side-car index file (by default the NDJSON file path with a '.idx' suffix)
+# can be built, in one streaming pass, to access any record directly. It is
+# made of a header (magic, format version, size and modification time of the
+# indexed file, so that stale indexes are detected), then of the uint64
+# little-endian offsets of the beginning of each non-empty line of the indexed
+# file, in order.
+
+index_magic = b'NDJI'
+index_version = 1
+
+index_header_format = '<4sHHQQ'
+index_header_size = struct.calcsize(index_header_format)
+
+
+
+def get_index_path(path):
+    """Returns the default index path for specified NDJSON file."""
+    return path + '.idx'
+
+
+
+def get_index_header(path):
+    """Returns the index header corresponding to specified NDJSON file."""
+    st = os.stat(path)
+    return struct.pack(index_header_format, index_magic, index_version, 0, st.st_size, st.st_mtime_ns)
+
+
+
+def build_line_index(path, index_path=None):
+    """
+    Builds the line index of specified (regular, uncompressed) NDJSON file.
+    Returns the number of indexed records.
+    """
+    if is_gzip_file(path):
+        raise NdjsonUtilsException("Unable to index '%s', as it is compressed." % (path,))
+
+    index_path = index_path or get_index_path(path)
+
+    count = 0
+    temp_path = index_path + '.tmp'
+
+    with open(path, 'rb', buffering=buffer_size) as f_in:
+        with open(temp_path, 'wb') as f_out:
+            f_out.write(get_index_header(path))
+            offsets = array.array('Q')
+            offset = 0
+            for line in f_in:
+                if line.strip():
+                    offsets.append(offset)
+                offset += len(line)
+                if len(offsets) >= column_batch_size:
+                    count += len(offsets)
+                    write_array(f_out, offsets)
+                    offsets = array.array('Q')
+            count += len(offsets)
+            write_array(f_out, offsets)
+
+    os.replace(temp_path, index_path)
+
+    return count
+
+
+
+class NdjsonIndex:
+    """
+    Gives random access, through mmap, to the records of an indexed NDJSON
+    file, without scanning it.
+    """
+
+    def __init__(self, path, index_path=None):
+        """
+        Opens specified NDJSON file and its index, which must be up to date.
+        """
+        self.path = path
+        self.index_path = index_path or get_index_path(path)
+
+        self.index_file = open(self.index_path, 'rb')
+        header = self.index_file.read(index_header_size)
+        if header != get_index_header(path):
+            self.index_file.close()
+            raise NdjsonUtilsException("The index '%s' does not match '%s' (stale or invalid)." % (self.index_path, path))
+
+        self.count = (os.path.getsize(self.index_path) - index_header_size) // 8
+
+        self.data_file = open(path, 'rb')
+        self.index_map = None
+        self.data_map = None
+        if self.count:
+            self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data_map = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    def close(self):
+        """Releases the resources associated to this index."""
+        for m in [self.index_map, self.data_map]:
+            if m is not None:
+                m.close()
+        self.index_map = None
+        self.data_map = None
+        self.index_file.close()
+        self.data_file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def __len__(self):
+        """Returns the number of records of the indexed file."""
+        return self.count
+
+
+    def get_offset(self, n):
+        """Returns the offset of the record of specified rank."""
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError("No record of rank %s (record count: %s)." % (n, self.count))
+        return struct.unpack_from('<Q', self.index_map, index_header_size + 8 * n)[0]
+
+
+    def get_line(self, n):
+        """Returns the raw line (as bytes) of the record of specified rank."""
+        start = self.get_offset(n)
+        end = self.data_map.find(b'\n', start)
+        if end < 0:
+            end = len(self.data_map)
+        return self.data_map[start:end]
+
+
+    def get_record(self, n):
+        """Returns the record of specified rank."""
+        return decode_line(self.get_line(n), "record %s" % (n,))
+
+
+    def get_records(self, start, stop):
+        """Returns the list of the records of rank in [start, stop[."""
+        return [self.get_record(n) for n in range(*slice(start, stop).indices(self.count))]
+
+
+
+def open_index(path, index_path=None):
+    """
+    Returns a NdjsonIndex for specified NDJSON file, (re)building its index
+    first if it is missing or stale.
+    """
+    index_path = index_path or get_index_path(path)
+    try:
+        return NdjsonIndex(path, index_path)
+    except (OSError, NdjsonUtilsException):
+        build_line_index(path, index_path)
+        return NdjsonIndex(path, index_path)
+
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,657 @@
+#!/usr/bin/env python
+
+__title__       = 'This module allows to search efficiently for expressions in Python source trees.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = "Used notably by the pygrep script. Expressions are Python regular expressions, matched against the memory-mapped bytes of the files, which are searched in parallel. An optional trigram index narrows down the files to search. Structural searches (definitions, calls, imports) rely on the parsing of the files, whose results are cached."
+__source__      = 'None'
+__doc__         = __title__ + '\n' + __comments__
+
+
+# Import standard python modules:
+import sys, os, re, ast, mmap, hashlib, sqlite3, linecache, concurrent.futures
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    # Before Python 3.11:
+    import sre_parse
+
+# Import home-made modules:
+from general_utils import GeneralUtilsException
+
+
+class SearchUtilsException(GeneralUtilsException):
+    """Base class for search_utils exceptions."""
+
+
+# Names of the directories that are never searched:
+ignored_dir_names = set(['.git', '.hg', '.svn', '__pycache__', '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache', 'node_modules', '.venv', 'venv'])
+
+# Number of files searched per task of a worker process:
+files_per_task = 64
+
+# Below this number of files, no worker process is used:
+parallel_threshold = 256
+
+
+
+def is_virtual_env(dir_path):
+    """Returns true if and only if specified directory is a virtual env."""
+    return os.path.isfile(os.path.join(dir_path, 'pyvenv.cfg'))
+
+
+
+def is_python_file(name, insensitive=False):
+    """Tells whether specified filename designates a Python source file."""
+    if insensitive:
+        return name.lower().endswith('.py')
+    return name.endswith('.py')
+
+
+
+def iter_python_files(base_dir, insensitive=False):
+    """
+    Yields the paths (prefixed with specified base directory) of the Python
+    files found from specified directory, in a stable (name) order; version
+    control, cache and virtual env directories are skipped.
+    """
+    to_visit = [base_dir]
+    while to_visit:
+        current = to_visit.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for e in entries:
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    if not e.name in ignored_dir_names and not is_virtual_env(e.path):
+                        subdirs.append(e.path)
+                elif is_python_file(e.name, insensitive) and e.is_file():
+                    yield e.path
+            except OSError:
+                continue
+        # Visiting subdirectories in name order:
+        to_visit.extend(reversed(subdirs))
+
+
+
+def compile_expression(expression, insensitive=False):
+    """
+    Returns the compiled (bytes) regular expression corresponding to the
+    specified (string) one.
+    """
+    flags = re.MULTILINE
+    if insensitive:
+        flags |= re.IGNORECASE
+    try:
+        return re.compile(os.fsencode(expression), flags)
+    except re.error as e:
+        raise SearchUtilsException("Invalid expression '%s': %s." % (expression, e))
+
+
+
+def search_file(path, regex, filenames_only=False):
+    """
+    Returns the list of the (line number, line) pairs of specified file
+    matching specified compiled expression, lines being bytes (without their
+    end of line); if only filenames are wanted, returns a list of at most one
+    element, telling only whether there is a match.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return search_data(data, regex, filenames_only)
+    except OSError:
+        return []
+
+
+
+def search_data(data, regex, filenames_only=False):
+    """
+    Returns the (line number, line) pairs of the specified bytes that match
+    specified compiled expression (see search_file).
+    """
+    if filenames_only:
+        if regex.search(data):
+            return [(0, b'')]
+        return []
+
+    matches = []
+    line_number = 1
+    counted_until = 0
+    pos = 0
+    size = len(data)
+    while pos <= size:
+        m = regex.search(data, pos)
+        if not m:
+            break
+        line_start = data.rfind(b'\n', 0, m.start()) + 1
+        line_end = data.find(b'\n', m.start())
+        if line_end < 0:
+            line_end = size
+        # (mmap objects have no count method; slicing copies only this span)
+        line_number += data[counted_until:line_start].count(b'\n')
+        counted_until = line_start
+        matches.append((line_number, data[line_start:line_end]))
+        # At most one match per line:
+        pos = line_end + 1
+    return matches
+
+
+
+def search_files(task):
+    """
+    Searches the files of specified task, a (paths, expression, insensitive,
+    filenames_only) tuple; returns the list of the (path, matches) pairs of the
+    files having matches. Meant to be run in a worker process.
+    """
+    (paths, expression, insensitive, filenames_only) = task
+    regex = compile_expression(expression, insensitive)
+    res = []
+    for p in paths:
+        matches = search_file(p, regex, filenames_only)
+        if matches:
+            res.append((p, matches))
+    return res
+
+
+
+# Trigram index.
+#
+# To avoid scanning all files at each search, an on-disk index (a SQLite
+# database) can record, for each file, the set of the trigrams (3-byte
+# sequences) of its (ASCII-lowercased) content, along with its modification
+# time and size, so that it is updated incrementally. The literal parts that
+# any match of an expression must contain tell which trigrams the searched
+# files must have; only the files having all of them are then actually
+# searched.
+
+index_schema = """
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (trigram INTEGER NOT NULL, file_id INTEGER NOT NULL, PRIMARY KEY (trigram, file_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_file ON postings (file_id);
+"""
+
+
+
+def get_default_index_path(base_dir, suffix=''):
+    """
+    Returns the default path of the index of specified base directory, in the
+    user cache directory; the suffix allows to distinguish index kinds.
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    digest = hashlib.md5(os.fsencode(os.path.realpath(base_dir))).hexdigest()
+    return os.path.join(cache_dir, 'pygrep', '%s%s.db' % (digest, suffix))
+
+
+
+def find_changes(known, paths):
+    """
+    Determines, from specified dictionary whose keys are paths and values are
+    the (id, mtime_ns, size) triplets recorded for them, which of the
+    specified (absolute) paths changed. Returns a (changed, vanished) pair,
+    where changed is a dictionary whose keys are the paths of the new or
+    modified files, and values their (mtime_ns, size) pair, and where
+    vanished is the list of the identifiers of the files that are no longer
+    among the specified ones.
+    """
+    known = dict(known)
+    changed = {}
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        entry = known.pop(p, None)
+        if entry is None or entry[1] != st.st_mtime_ns or entry[2] != st.st_size:
+            changed[p] = (st.st_mtime_ns, st.st_size)
+    return (changed, [entry[0] for entry in known.values()])
+
+
+
+def map_files(function, paths, jobs=None):
+    """
+    Yields, in order, the results of specified function applied to each of
+    the specified paths, in worker processes if there are enough of them.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) < parallel_threshold:
+        for p in paths:
+            yield function(p)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        for r in executor.map(function, paths, chunksize=files_per_task):
+            yield r
+
+
+
+def get_trigrams(data):
+    """
+    Returns the set of the trigrams, as integers, of specified bytes, once
+    ASCII-lowercased.
+    """
+    data = data.lower()
+    return set(int.from_bytes(data[i:i + 3], 'big') for i in range(len(data) - 2))
+
+
+
+def get_file_trigrams(path):
+    """
+    Returns a (path, trigrams) pair for specified file; meant to be run in a
+    worker process.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return (path, get_trigrams(f.read()))
+    except OSError:
+        return (path, set())
+
+
+
+def get_required_literals(expression, insensitive=False):
+    """
+    Returns a list of byte strings that any match of specified expression
+    contains (possibly an empty list, if none can be determined).
+    """
+    try:
+        parsed = sre_parse.parse(expression)
+    except Exception:
+        return []
+
+    # Inline flags (ex: '(?i)') also make the search case-insensitive:
+    if parsed.state.flags & re.IGNORECASE:
+        insensitive = True
+
+    literals = []
+    current = []
+
+    def end_run():
+        if current:
+            literals.append(''.join(current))
+            del current[:]
+
+    for (op, arg) in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+        else:
+            end_run()
+    end_run()
+
+    res = []
+    for l in literals:
+        encoded = os.fsencode(l)
+        # Case folding of non-ASCII characters is not supported by the index:
+        if insensitive and not encoded.isascii():
+            continue
+        res.append(encoded)
+    return res
+
+
+
+class TrigramIndex:
+    """
+    An on-disk trigram index of source files, updated incrementally based on
+    their modification time and size.
+    """
+
+    def __init__(self, index_path):
+        """Opens (creating it if needed) the index at specified path."""
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self.index_path = index_path
+        self.db = sqlite3.connect(index_path)
+        self.db.executescript(index_schema)
+
+
+    def close(self):
+        self.db.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def update(self, paths, jobs=None):
+        """
+        Updates the index so that it covers exactly the specified files (given
+        as absolute paths), reindexing only the ones that changed. Returns the
+        number of reindexed files.
+        """
+        known = dict((path, (file_id, mtime_ns, size)) for (file_id, path, mtime_ns, size) in self.db.execute("SELECT id, path, mtime_ns, size FROM files"))
+
+        (changed, vanished) = find_changes(known, paths)
+
+        with self.db:
+
+            for file_id in vanished:
+                self.db.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+                self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+            for (p, trigrams) in map_files(get_file_trigrams, list(changed), jobs):
+                (mtime_ns, size) = changed[p]
+                row = self.db.execute("SELECT id FROM files WHERE path = ?", (p,)).fetchone()
+                if row:
+                    file_id = row[0]
+                    self.db.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+                    self.db.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?", (mtime_ns, size, file_id))
+                else:
+                    file_id = self.db.execute("INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)", (p, mtime_ns, size)).lastrowid
+                self.db.executemany("INSERT INTO postings (trigram, file_id) VALUES (?, ?)", ((t, file_id) for t in trigrams))
+
+        return len(changed)
+
+
+    def get_candidates(self, expression, insensitive=False):
+        """
+        Returns the set of the (absolute) paths of the indexed files that may
+        match specified expression, or None if any file may match.
+        """
+        trigrams = set()
+        for l in get_required_literals(expression, insensitive):
+            trigrams.update(get_trigrams(l))
+
+        if not trigrams:
+            return None
+
+        file_ids = None
+        for t in trigrams:
+            ids = set(row[0] for row in self.db.execute("SELECT file_id FROM postings WHERE trigram = ?", (t,)))
+            if file_ids is None:
+                file_ids = ids
+            else:
+                file_ids &= ids
+            if not file_ids:
+                return set()
+
+        res = set()
+        for file_id in file_ids:
+            row = self.db.execute("SELECT path FROM files WHERE id = ?", (file_id,)).fetchone()
+            if row:
+                res.add(row[0])
+        return res
+
+
+
+def search(expression, base_dir='.', insensitive=False, filenames_only=False, jobs=None, paths=None, index_path=None):
+    """
+    Searches specified (Python regular) expression in the Python files found
+    from specified base directory (or in the specified paths), and yields, in
+    file order, the (path, matches) pairs of the files having matches, where
+    matches is a list of (line number, line) pairs (see search_file).
+
+    Files are searched by specified number of worker processes (by default,
+    one per core), unless there are only a few of them.
+
+    If an index path is specified, the corresponding trigram index is updated
+    and used to search only the files that may match.
+    """
+    # Validates the expression early:
+    compile_expression(expression, insensitive)
+
+    if paths is None:
+        paths = list(iter_python_files(base_dir, insensitive))
+
+    if index_path:
+        absolute_paths = [os.path.abspath(p) for p in paths]
+        with TrigramIndex(index_path) as index:
+            index.update(absolute_paths, jobs)
+            candidates = index.get_candidates(expression, insensitive)
+        if candidates is not None:
+            paths = [p for (p, a) in zip(paths, absolute_paths) if a in candidates]
+
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1 or len(paths) < parallel_threshold:
+        for r in search_files((paths, expression, insensitive, filenames_only)):
+            yield r
+        return
+
+    tasks = [(paths[i:i + files_per_task], expression, insensitive, filenames_only) for i in range(0, len(paths), files_per_task)]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        for results in executor.map(search_files, tasks):
+            for r in results:
+                yield r
+
+
+
+
+
+# Structural search.
+#
+# Files can also be searched for the definitions (of functions and classes),
+# the calls and the imports of a given name, based on their parsing. The
+# symbols of each file can be cached in an on-disk index (a SQLite database),
+# updated incrementally based on the modification time and size of the files.
+
+# Kinds of symbols:
+definition_kind = 'def'
+call_kind = 'call'
+import_kind = 'import'
+
+symbol_kinds = [definition_kind, call_kind, import_kind]
+
+symbol_schema = """
+CREATE TABLE IF NOT EXISTS symbol_files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS symbols (file_id INTEGER NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL, short_name TEXT NOT NULL, lineno INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS symbols_by_name ON symbols (kind, name);
+CREATE INDEX IF NOT EXISTS symbols_by_short_name ON symbols (kind, short_name);
+CREATE INDEX IF NOT EXISTS symbols_by_file ON symbols (file_id);
+"""
+
+
+
+def get_dotted_name(node):
+    """
+    Returns the dotted name (ex: 'os.path.join') designated by specified AST
+    expression, or None if it is not a (possibly qualified) name.
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+    elif parts:
+        # Ex: 'get_obj().method()', designated as '.method':
+        parts.append('')
+    else:
+        return None
+    return '.'.join(reversed(parts))
+
+
+
+def get_symbols(source):
+    """
+    Returns the list, sorted by line, of the (kind, name, short name, line
+    number) symbols of specified Python source, the short name being the last
+    element of a dotted name.
+    """
+    res = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            res.append((definition_kind, node.name, node.name, node.lineno))
+        elif isinstance(node, ast.Call):
+            name = get_dotted_name(node.func)
+            if name is not None:
+                res.append((call_kind, name, name.rsplit('.', 1)[-1], node.lineno))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                res.append((import_kind, alias.name, alias.name, node.lineno))
+        elif isinstance(node, ast.ImportFrom):
+            module = '.' * node.level + (node.module or '')
+            res.append((import_kind, module, module, node.lineno))
+            for alias in node.names:
+                name = module.endswith('.') and module + alias.name or module + '.' + alias.name
+                res.append((import_kind, name, name, node.lineno))
+    res.sort(key=lambda s: s[3])
+    return res
+
+
+
+def get_file_symbols(path):
+    """
+    Returns a (path, symbols) pair for specified file, symbols being an empty
+    list if the file cannot be read or parsed; meant to be run in a worker
+    process.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return (path, get_symbols(f.read()))
+    except (OSError, SyntaxError, ValueError):
+        return (path, [])
+
+
+
+def symbol_matches(symbol, kind, name):
+    """
+    Tells whether specified symbol matches specified kind and name: calls
+    match on their full or short name, imports on their module or any parent
+    module.
+    """
+    (symbol_kind, symbol_name, short_name, lineno) = symbol
+    if symbol_kind != kind:
+        return False
+    if kind == call_kind:
+        return name == symbol_name or name == short_name
+    if kind == import_kind:
+        return symbol_name == name or symbol_name.startswith(name + '.')
+    return symbol_name == name
+
+
+
+class SymbolIndex:
+    """
+    An on-disk cache of the symbols of source files, updated incrementally
+    based on their modification time and size.
+    """
+
+    def __init__(self, index_path):
+        """Opens (creating it if needed) the index at specified path."""
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self.index_path = index_path
+        self.db = sqlite3.connect(index_path)
+        self.db.executescript(symbol_schema)
+
+
+    def close(self):
+        self.db.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def update(self, paths, jobs=None):
+        """
+        Updates the index so that it covers exactly the specified files (given
+        as absolute paths), reparsing only the ones that changed. Returns the
+        number of reparsed files.
+        """
+        known = dict((path, (file_id, mtime_ns, size)) for (file_id, path, mtime_ns, size) in self.db.execute("SELECT id, path, mtime_ns, size FROM symbol_files"))
+
+        (changed, vanished) = find_changes(known, paths)
+
+        with self.db:
+
+            for file_id in vanished:
+                self.db.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+                self.db.execute("DELETE FROM symbol_files WHERE id = ?", (file_id,))
+
+            for (p, symbols) in map_files(get_file_symbols, list(changed), jobs):
+                (mtime_ns, size) = changed[p]
+                row = self.db.execute("SELECT id FROM symbol_files WHERE path = ?", (p,)).fetchone()
+                if row:
+                    file_id = row[0]
+                    self.db.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+                    self.db.execute("UPDATE symbol_files SET mtime_ns = ?, size = ? WHERE id = ?", (mtime_ns, size, file_id))
+                else:
+                    file_id = self.db.execute("INSERT INTO symbol_files (path, mtime_ns, size) VALUES (?, ?, ?)", (p, mtime_ns, size)).lastrowid
+                self.db.executemany("INSERT INTO symbols (file_id, kind, name, short_name, lineno) VALUES (?, ?, ?, ?, ?)", ((file_id,) + s for s in symbols))
+
+        return len(changed)
+
+
+    def find(self, kind, name):
+        """
+        Returns a dictionary whose keys are the (absolute) paths of the files
+        having symbols matching specified kind and name, and whose values are
+        the sorted lists of the line numbers of these symbols.
+        """
+        if kind == call_kind:
+            query = "SELECT path, lineno FROM symbols JOIN symbol_files ON file_id = id WHERE kind = ? AND (name = ? OR short_name = ?)"
+            params = (kind, name, name)
+        elif kind == import_kind:
+            # Range over the names prefixed with 'NAME.' ('/' follows '.'):
+            query = "SELECT path, lineno FROM symbols JOIN symbol_files ON file_id = id WHERE kind = ? AND (name = ? OR (name > ? AND name < ?))"
+            params = (kind, name, name + '.', name + '/')
+        else:
+            query = "SELECT path, lineno FROM symbols JOIN symbol_files ON file_id = id WHERE kind = ? AND name = ?"
+            params = (kind, name)
+        res = {}
+        for (path, lineno) in self.db.execute(query, params):
+            res.setdefault(path, set()).add(lineno)
+        return dict((p, sorted(l)) for (p, l) in res.items())
+
+
+
+def get_line(path, line_number):
+    """Returns specified line (as bytes, without end of line) of specified file."""
+    return os.fsencode(linecache.getline(path, line_number).rstrip('\r\n'))
+
+
+
+def search_structure(kind, name, base_dir='.', insensitive=False, jobs=None, paths=None, index_path=None):
+    """
+    Searches the symbols of specified kind (see symbol_kinds) and name in the
+    Python files found from specified base directory (or in the specified
+    paths), and yields, in file order, the (path, matches) pairs of the files
+    having matches, where matches is a list of (line number, line) pairs.
+
+    If an index path is specified, the symbols are cached in the
+    corresponding index, so that only the files that changed are parsed.
+    """
+    if not kind in symbol_kinds:
+        raise SearchUtilsException("Unknown symbol kind '%s'." % (kind,))
+
+    if paths is None:
+        paths = list(iter_python_files(base_dir, insensitive))
+
+    if index_path:
+        absolute_paths = [os.path.abspath(p) for p in paths]
+        with SymbolIndex(index_path) as index:
+            index.update(absolute_paths, jobs)
+            found = index.find(kind, name)
+        for (p, a) in zip(paths, absolute_paths):
+            if a in found:
+                yield (p, [(n, get_line(p, n)) for n in found[a]])
+        return
+
+    for (p, symbols) in map_files(get_file_symbols, paths, jobs):
+        line_numbers = sorted(set(s[3] for s in symbols if symbol_matches(s, kind, name)))
+        if line_numbers:
+            yield (p, [(n, get_line(p, n)) for n in line_numbers])
+
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+__title__       = 'This is the test of the Blender support modules not requiring Blender.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = 'Testing module.'
+__source__      = 'OSDL (http://osdl.sourceforge.net)'
+__doc__         = __title__ + '\n' + __comments__
+
+__testTarget__  = 'blender_snake, blender_build, blender_cache and blender_batch_convert'
+
+
+import os, sys, json, time, shutil, tempfile
+
+# These modules are not in the Python path of the tests:
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'blender-support'))
+
+import blender_snake, blender_build, blender_cache, blender_batch_convert
+from blender_snake import ContentFormat
+
+
+print('Beginning test of modules %s.\n\n' % ( __testTarget__, ))
+
+test_dir = tempfile.mkdtemp()
+
+
+def write_file(name, content):
+    path = os.path.join(test_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, isinstance(content, bytes) and 'wb' or 'w') as f:
+        f.write(content)
+    return path
+
+
+print('Testing format detection...')
+
+assert blender_snake.sniff_format(b'glTF\x02\x00\x00\x00') == ContentFormat.GLTF
+assert blender_snake.sniff_format(b'Kaydara FBX Binary  \x00') == ContentFormat.FBX
+assert blender_snake.sniff_format(b'\xef\xbb\xbfISO-10303-21;\nHEADER;') == ContentFormat.IFC
+assert blender_snake.sniff_format(b'<?xml version="1.0"?>\n<COLLADA>') == ContentFormat.COLLADA
+assert blender_snake.sniff_format(b'{ "asset": { "version": "2.0" } }') == ContentFormat.GLTF
+assert blender_snake.sniff_format(b'# Comment\nmtllib a.mtl\nv 0 0 0\nf 1 2 3\n') == ContentFormat.OBJ
+assert blender_snake.sniff_format(b'Hello world') == ContentFormat.UNKNOWN
+
+# Sorted keys put "asset" after the (possibly large) accessors:
+accessors = [ { "bufferView": i, "componentType": 5126, "count": 3, "type": "VEC3" } for i in range(200) ]
+gltf_path = write_file('sorted.gltf', json.dumps({ "accessors": accessors, "asset": { "version": "2.0" } }, sort_keys=True))
+assert os.path.getsize(gltf_path) > blender_snake.sniff_size
+assert blender_snake.get_format(gltf_path) == ContentFormat.GLTF
+
+dae_path = write_file('preamble.dae', '<?xml version="1.0"?>\n<!-- %s -->\n<COLLADA/>\n' % ('x' * 5000,))
+assert blender_snake.get_format(dae_path) == ContentFormat.COLLADA
+
+obj_path = write_file('unusual.obj', 'usemap none\nv 0 0 0\n')
+assert blender_snake.get_format(obj_path) == ContentFormat.OBJ
+
+# Contradicting content:
+assert blender_snake.get_format(write_file('fake.glb', b'{ "asset": {} }'), warn=False) == ContentFormat.GLTF
+assert blender_snake.get_format(write_file('binary.obj', b'\x00\x01\x02'), warn=False) == ContentFormat.UNKNOWN
+assert blender_snake.get_format(write_file('text.glb', b'Hello'), warn=False) == ContentFormat.UNKNOWN
+assert blender_snake.get_format(write_file('misnamed.fbx', b'glTF\x02'), warn=False) == ContentFormat.GLTF
+assert blender_snake.get_format(write_file('notes.txt', 'Hello'), warn=False) == ContentFormat.UNKNOWN
+
+print('...done\n')
+
+
+print('Testing output specifications...')
+
+assert blender_snake.parse_lod_levels('0.5,0.1') == [ { "ratio": 0.5, "budget": None }, { "ratio": 0.1, "budget": None } ]
+assert blender_snake.parse_lod_levels(None, '1000') == [ { "ratio": 1.0, "budget": 1000 } ]
+assert blender_snake.parse_lod_levels('0.5', '1000') == [ { "ratio": 0.5, "budget": 1000 } ]
+assert blender_snake.parse_lod_levels() == []
+
+for (ratios, budgets) in [ ('0.5,0.1', '1000'), ('1.5', None), ('0', None), (None, '-1'), ('half', None) ]:
+    try:
+        blender_snake.parse_lod_levels(ratios, budgets)
+        assert False
+    except SystemExit:
+        pass
+
+assert blender_snake.parse_output_spec('preview') == ('preview', '.preview.glb')
+assert blender_snake.parse_output_spec('preview:-lod.glb') == ('preview', '-lod.glb')
+
+try:
+    blender_snake.parse_output_spec('no-such-profile')
+    assert False
+except SystemExit:
+    pass
+
+print('...done\n')
+
+
+print('Testing static dependencies...')
+
+gltf_path = write_file('scene/scene.gltf', json.dumps({ "asset": { "version": "2.0" },
+    "buffers": [ { "uri": "scene.bin" }, { "uri": "data:application/octet-stream;base64,AAAA" } ],
+    "images": [ { "uri": "textures/my%20wall.png" }, { "bufferView": 0 } ] }))
+scene_dir = os.path.dirname(gltf_path)
+assert blender_snake.get_static_dependencies(gltf_path, ContentFormat.GLTF) == [
+    os.path.join(scene_dir, 'scene.bin'), os.path.join(scene_dir, 'textures', 'my wall.png') ]
+
+obj_path = write_file('scene/scene.obj', 'mtllib first.mtl second.mtl\nv 0 0 0\n')
+write_file('scene/first.mtl', 'newmtl wall\nmap_Kd -s 1 1 1 wall.png\nbump wall-bump.png\n')
+assert blender_snake.get_static_dependencies(obj_path, ContentFormat.OBJ) == [
+    os.path.join(scene_dir, name) for name in ('first.mtl', 'second.mtl', 'wall.png', 'wall-bump.png') ]
+
+print('...done\n')
+
+
+print('Testing the build database...')
+
+db_path = os.path.join(test_dir, 'build.json')
+content_path = write_file('build/model.obj', 'v 0 0 0\n')
+side_path = write_file('build/model.mtl', 'newmtl m\n')
+output_path = write_file('build/model.glb', b'glTF')
+
+database = blender_build.BuildDatabase(db_path)
+assert not database.is_up_to_date(content_path)
+
+database.record(content_path, [ output_path ], [ side_path ], { "profile": "default" })
+database.save()
+
+database = blender_build.BuildDatabase(db_path)
+assert database.is_up_to_date(content_path, { "profile": "default" })
+assert not database.is_up_to_date(content_path, { "profile": "preview" })
+assert database.get_dependencies(content_path) == [ side_path ]
+
+# A changed side file makes the outputs out of date:
+write_file('build/model.mtl', 'newmtl other\n')
+assert not database.is_up_to_date(content_path, { "profile": "default" })
+
+database.record(content_path, [ output_path ], [ side_path ], { "profile": "default" })
+assert database.is_up_to_date(content_path, { "profile": "default" })
+
+os.remove(output_path)
+assert not database.is_up_to_date(content_path, { "profile": "default" })
+
+print('...done\n')
+
+
+print('Testing the conversion cache...')
+
+cache = blender_cache.ConversionCache(os.path.join(test_dir, 'cache'), max_size=25)
+
+first_key = blender_cache.compute_key(content_path, 'Blender 4.2')
+assert first_key == blender_cache.compute_key(content_path, 'Blender 4.2')
+assert first_key != blender_cache.compute_key(content_path, 'Blender 4.3')
+assert first_key != blender_cache.compute_key(content_path, 'Blender 4.2', 'preview')
+
+target_path = os.path.join(test_dir, 'target.glb')
+assert not cache.lookup(first_key, target_path)
+
+cache.store(first_key, write_file('produced/first.glb', b'0123456789'))
+assert cache.lookup(first_key, target_path)
+with open(target_path, 'rb') as f:
+    assert f.read() == b'0123456789'
+
+# A corrupted entry is dropped:
+with open(cache.get_entry_path(first_key), 'wb') as f:
+    f.write(b'9876543210')
+assert not cache.lookup(first_key, target_path)
+assert cache.get_entry_count() == 0
+
+# Least recently used entries are evicted first:
+for key in ('a' * 64, 'b' * 64):
+    cache.store(key, write_file('produced/%s.glb' % (key[0],), b'0123456789'))
+    time.sleep(0.01)
+
+assert cache.lookup('a' * 64, target_path)
+time.sleep(0.01)
+cache.store('c' * 64, write_file('produced/c.glb', b'0123456789'))
+
+assert cache.get_entry_count() == 2 and cache.get_total_size() == 20
+assert cache.lookup('a' * 64, target_path) and not cache.lookup('b' * 64, target_path)
+
+cache.close()
+
+print('...done\n')
+
+
+print('Testing cached conversions of assets with searched textures...')
+
+# A fake Blender, whose conversions embed a texture that it "found by image
+# search" (thus not among the static dependencies):
+#
+fake_blender = write_file('fake-blender', """#!%s
+import sys, os, json
+if '--version' in sys.argv:
+    print('Blender 0.0 (fake)')
+    sys.exit(0)
+for line in sys.stdin:
+    content_file = line.strip()
+    if not content_file:
+        break
+    base_name = os.path.splitext(content_file)[0]
+    texture = os.path.join(os.path.dirname(content_file), 'tex.png')
+    with open(texture) as f_in, open(base_name + '.glb', 'w') as f_out:
+        f_out.write(f_in.read())
+    print('@@blender-convert-status ' + json.dumps({ 'input': content_file, 'status': 'ok', 'output': base_name + '.glb', 'outputs': [ base_name + '.glb' ], 'dependencies': [ texture ], 'duration': 0.0 }), flush=True)
+""" % (sys.executable,))
+os.chmod(fake_blender, 0o755)
+
+fbx_path = write_file('searched/model.fbx', '; FBX 7.4.0 project file\n')
+texture_path = write_file('searched/tex.png', 'v1')
+
+cache = blender_cache.ConversionCache(os.path.join(test_dir, 'searched-cache'))
+database = blender_build.BuildDatabase(os.path.join(test_dir, 'searched-build.json'))
+
+def convert_searched():
+    (status,) = blender_batch_convert.convert_all([ fbx_path ], fake_blender, cache=cache, build_db=database)
+    with open(status["outputs"][0]) as f:
+        return (status["status"], f.read())
+
+assert convert_searched() == ('ok', 'v1')
+assert convert_searched() == ('up-to-date', 'v1')
+
+time.sleep(0.01)
+write_file('searched/tex.png', 'v2')
+
+assert convert_searched() == ('ok', 'v2')
+assert convert_searched() == ('up-to-date', 'v2')
+
+# Back to a previous texture, whose conversion is cached once the texture is
+# known as a dependency:
+#
+write_file('searched/tex.png', 'v1')
+assert convert_searched() == ('ok', 'v1')
+write_file('searched/tex.png', 'v2')
+assert convert_searched() == ('cached', 'v2')
+assert convert_searched() == ('up-to-date', 'v2')
+
+cache.close()
+
+print('...done\n')
+
+
+print('Testing conversion arguments...')
+
+settings = blender_batch_convert.get_output_settings()
+assert blender_batch_convert.get_convert_args(settings) == [ '--profile', 'default' ]
+
+settings = blender_batch_convert.get_output_settings('archive', [ 'preview:-lod.glb' ],
+    blender_snake.parse_lod_levels('0.5,0.1', '1000,100'), merge_by_material=True)
+assert settings["optimize"]
+assert blender_batch_convert.get_convert_args(settings) == [ '--profile', 'archive',
+    '--extra-output', 'preview:-lod.glb', '--lods', '0.5,0.1', '--lod-budgets', '1000,100',
+    '--merge-by-material' ]
+
+settings = blender_batch_convert.get_output_settings(optimize=True)
+assert blender_batch_convert.get_convert_args(settings) == [ '--profile', 'default', '--optimize' ]
+
+print('...done\n')
+
+
+shutil.rmtree(test_dir)
+
+print('End of test for modules %s.\n' % ( __testTarget__, ))
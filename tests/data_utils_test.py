@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+__title__       = 'This is the test of the data module.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = 'Testing module.'
+__source__      = 'OSDL (http://osdl.sourceforge.net)'
+__doc__         = __title__ + '\n' + __comments__
+
+__testTarget__  = 'data_utils'
+
+
+from data_utils import *
+
+
+def build_tree(spec):
+    """Builds a tree from a (content, [child specs]) nested pair."""
+    (content, children) = spec
+    n = Node(content)
+    for c in children:
+        n.add_child(build_tree(c))
+    return n
+
+
+
+print('Beginning test of module %s.\n\n' % ( __testTarget__, ))
+
+
+print('Testing tree diff...')
+
+reference = build_tree(('a', [('b', []), ('c', [('d', [('e', []), ('f', [])])]), ('g', [])]))
+
+print('  + reference tree:')
+print(reference.to_string())
+
+same = build_tree(('a', [('b', []), ('c', [('d', [('e', []), ('f', [])])]), ('g', [])]))
+diff = reference.diff_with(same)
+print('  + identical trees: %s' % (diff,))
+assert diff.is_empty()
+
+# 'd' moved under 'g', 'b' deleted, 'h' inserted, 'e' updated into 'e2':
+changed = build_tree(('a', [('c', []), ('g', [('d', [('e', []), ('f', [])])]), ('h', [])]))
+diff = reference.diff_with(changed)
+print('  + changed trees: %s' % (diff,))
+assert [n.content for n in diff.inserted] == ['h']
+assert [n.content for n in diff.deleted] == ['b']
+assert [(r.content, n.content) for (r, n) in diff.moved] == [('d', 'd')]
+
+updated = build_tree(('a', [('b', []), ('c', [('d', [('e2', []), ('f', [])])]), ('g', [])]))
+diff = reference.diff_with(updated)
+print('  + updated trees: %s' % (diff,))
+assert [(r.content, n.content) for (r, n) in diff.updated] == [('e', 'e2')]
+assert not (diff.inserted or diff.deleted or diff.moved)
+
+# Moves are not mistaken for updates of the nodes at the same position:
+diff = build_tree(('r', [('A', [('x', []), ('old', [])]), ('B', [])])).diff_with(build_tree(('r', [('A', [('new', [])]), ('B', [('x', [])])])))
+print('  + moved trees: %s' % (diff,))
+assert [(r.content, n.content) for (r, n) in diff.moved] == [('x', 'x')]
+assert [n.content for n in diff.deleted] == ['old'] and [n.content for n in diff.inserted] == ['new']
+assert not diff.updated
+
+diff = build_tree(('r', [('d', [('x', [('y', [])])])])).diff_with(build_tree(('r', [('x', [('y', [])])])))
+assert [(r.content, n.content) for (r, n) in diff.moved] == [('x', 'x')]
+assert [n.content for n in diff.deleted] == ['d']
+assert not (diff.inserted or diff.updated)
+
+# Many changed siblings, in roughly linear time:
+import time
+sibling_count = 100000
+start = time.perf_counter()
+diff = build_tree(('r', [('a%s' % (i,), []) for i in range(sibling_count)])).diff_with(build_tree(('r', [('b%s' % (i,), []) for i in range(sibling_count)])))
+print('  + %s changed siblings compared in %.2f seconds' % (sibling_count, time.perf_counter() - start))
+assert len(diff.updated) == sibling_count
+
+print('...done\n')
+
+
+print('Testing binary tree format...')
+
+import os, tempfile
+
+(fd, tree_filename) = tempfile.mkstemp(suffix='.tree')
+os.close(fd)
+
+save_tree(reference, tree_filename)
+print('  + tree stored in %s bytes' % (os.path.getsize(tree_filename),))
+
+with load_tree(tree_filename) as mapped:
+    print('  + mapped tree has %s nodes' % (len(mapped),))
+    root = mapped.get_root()
+    assert root.get_content() == 'a'
+    assert [c.get_content() for c in root.get_children()] == ['b', 'c', 'g']
+    d = root.search_children('c').get_child(0)
+    assert bytes(mapped.get_bytes(d.tree.get_record(d.index)[0])) == b'd'
+    assert reference.diff_with(mapped.to_node()).is_empty()
+
+# Closing while a view is still held must not leak the file:
+mapped = load_tree(tree_filename)
+view = mapped.get_bytes(0)
+try:
+    mapped.close()
+    assert False
+except BufferError:
+    assert mapped.map is None and mapped.file.closed
+view.release()
+
+# Files truncated after their header are rejected when loaded:
+with open(tree_filename, 'rb') as f:
+    tree_data = f.read()
+
+for size in [tree_header_size + 1, len(tree_data) - 1]:
+    with open(tree_filename, 'wb') as f:
+        f.write(tree_data[:size])
+    try:
+        load_tree(tree_filename)
+        assert False
+    except DataUtilsException:
+        pass
+
+os.remove(tree_filename)
+
+print('...done\n')
+
+
+print('End of test for module %s.\n' % ( __testTarget__, ))
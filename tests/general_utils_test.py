@@ -61,6 +61,8 @@ my_spaced_screen_display = ScreenDisplay(spacing=15, truncate=40)
 my_spaced_screen_display('I', add_return=False)
 my_spaced_screen_display('am', add_return=False)
 my_spaced_screen_display('big', add_return=True)
+my_spaced_screen_display('(positionally)', False)
+my_spaced_screen_display.info('', True)
 
 my_screen_display.blank_line()
 print('      * testing string compressing')
@@ -100,5 +102,125 @@ my_file_display.remove()
 print('...done\n')
 
 
+print('Testing flush policies...')
+
+with FileDisplay('Buffered-log', flush_policy=Display.flush_by_size, flush_size=1024) as my_buffered_display:
+    for i in range(100):
+        my_buffered_display('Buffered message #%s.' % (i,))
+    print('  + %s bytes pending' % (my_buffered_display.pending_size,))
+    my_buffered_display.error('I shall be flushed immediately.')
+    assert my_buffered_display.pending_size == 0
+
+my_buffered_display.remove()
+
+my_screen_display = ScreenDisplay(flush_policy=Display.flush_by_line)
+my_screen_display.info('I am flushed at the end of my line.')
+
+# Displays are flushed at exit, yet not kept alive for that:
+import gc
+flushed_count = len(displays_to_flush)
+my_periodic_display = ScreenDisplay(flush_policy=Display.flush_by_period)
+assert my_periodic_display in displays_to_flush
+del my_periodic_display
+gc.collect()
+assert len(displays_to_flush) == flushed_count
+
+print('...done\n')
+
+
+print('Testing lazy formatting...')
+
+def expensive_message():
+    raise AssertionError('Disabled messages shall not be evaluated.')
+
+my_lazy_display = ScreenDisplay()
+my_lazy_display('I am %s message number %s.', args=('formatted', 1))
+my_lazy_display.info(lambda: 'I am evaluated on demand.')
+my_lazy_display.debug(lambda: 'I am a %s debug message.' % ('lazy',))
+
+my_lazy_display.setVerbosity(0)
+assert not my_lazy_display.is_enabled(Display.normal_level)
+my_lazy_display(expensive_message)
+
+my_lazy_display.do_debug = False
+assert not my_lazy_display.is_enabled(Display.debug_level)
+my_lazy_display.debug(expensive_message)
+
+print('...done\n')
+
+
+print('Testing StructuredDisplay...')
+
+import io, json
+
+my_records = io.StringIO()
+with StructuredDisplay(my_records) as my_structured_display:
+    my_structured_display('Hello, structured world!')
+    my_structured_display.indent()
+    my_structured_display.info('I am %s.', args=('indented',))
+    my_structured_display.error('I made a mistake.')
+
+for line in my_records.getvalue().splitlines():
+    print('  + %s' % (json.loads(line),))
+
+print('...done\n')
+
+
+print('Testing multiprocess display...')
+
+def run_worker(record_queue, worker_id):
+    worker_display = QueueDisplay(record_queue)
+    worker_display('Hello from worker #%s.', args=(worker_id,))
+    worker_display.indent()
+    worker_display.warning('Worker #%s shall warn its users.', args=(worker_id,))
+    worker_display('Worker #%s is indented.', args=(worker_id,))
+
+if __name__ == '__main__':
+
+    import multiprocessing
+
+    collected = io.StringIO()
+
+    with DisplayCollector(StructuredDisplay(collected)) as my_collector:
+        my_workers = [multiprocessing.Process(target=run_worker, args=(my_collector.queue, i)) for i in range(3)]
+        for w in my_workers:
+            w.start()
+        for w in my_workers:
+            w.join()
+
+    records = [json.loads(line) for line in collected.getvalue().splitlines()]
+    print('  + %s records collected' % (len(records),))
+
+    for i in range(3):
+        # The records of a worker are kept in order, with their own depth:
+        worker_records = [(r['level'], r['depth'], r['message']) for r in records if '#%s ' % (i,) in r['message'] or r['message'].endswith('#%s.' % (i,))]
+        assert worker_records == [
+            (Display.normal_level, 0, 'Hello from worker #%s.' % (i,)),
+            (Display.warning_level, 1, 'Worker #%s shall warn its users.' % (i,)),
+            (Display.normal_level, 1, 'Worker #%s is indented.' % (i,))], worker_records
+
+print('...done\n')
+
+
+print('Testing AsyncFileDisplay...')
+
+my_async_display = AsyncFileDisplay('Async-log', rotation_size=4096, compress_rotated=True)
+
+for i in range(500):
+    my_async_display('Asynchronous message #%s.' % (i,))
+my_async_display.warning('I shall warn my users.')
+
+my_async_display.flush()
+print('  + %s rotation(s) done' % (my_async_display.rotated_count,))
+
+my_async_display.remove()
+
+import glob
+for f in glob.glob('Async-log.txt.*.gz'):
+    os.remove(f)
+
+print('...done\n')
+
+
 
 print('End of test for module %s.\n' % ( __testTarget__, ))
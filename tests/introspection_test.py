@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+__title__       = 'This is the test of the introspection module.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = 'Testing module.'
+__source__      = 'OSDL (http://osdl.sourceforge.net)'
+__doc__         = __title__ + '\n' + __comments__
+
+__testTarget__  = 'introspection'
+
+
+from introspection import *
+
+import introspection
+
+
+print('Beginning test of module %s.\n\n' % ( __testTarget__, ))
+
+
+class Base:
+    """A base class."""
+
+    def inherited(self):
+        """An inherited method."""
+
+
+class Tested(Base):
+    """A class whose members are to be introspected."""
+
+    evaluations = 0
+
+    def __init__(self):
+        self.data = 42
+
+    @property
+    def costly(self):
+        """A property that shall not be evaluated."""
+        Tested.evaluations += 1
+        return 0
+
+    @staticmethod
+    def helper(x, y=2):
+        return x + y
+
+    def method(self, a, b=1):
+        """A method."""
+
+
+print('Testing static member lookup...')
+
+tested = Tested()
+
+members = dict((m.name, m) for m in iter_members(tested, include_private=False))
+
+assert members['costly'].kind == 'property'
+assert members['helper'].kind == 'staticmethod'
+assert members['method'].kind == 'method'
+assert members['inherited'].owner is Base
+assert members['data'].kind == 'data' and members['data'].value == 42
+assert get_member(tested, 'costly').doc == 'A property that shall not be evaluated.'
+assert Tested.evaluations == 0
+
+show_methods(tested)
+show_data_members(tested)
+
+print('...done\n')
+
+
+print('Testing the member cache...')
+
+import gc
+
+class Transient(Base):
+    pass
+
+get_member(Transient(), 'inherited')
+assert len(introspection._member_tables) > 0
+
+clear_cache()
+get_member(Transient(), 'inherited')
+assert len(introspection._member_tables) == 1
+
+del Transient
+gc.collect()
+assert len(introspection._member_tables) == 0
+
+# Changes of classes are taken into account:
+class Changing(Base):
+    def removed(self):
+        pass
+
+assert 'removed' in [m.name for m in iter_members(Changing)]
+del Changing.removed
+Changing.added = 1
+Base.base_added = 2
+names = [m.name for m in iter_members(Changing)]
+assert not 'removed' in names and 'added' in names and 'base_added' in names
+del Base.base_added
+assert not 'base_added' in [m.name for m in iter_members(Changing)]
+
+print('...done\n')
+
+
+print('Testing modules and functions...')
+
+names = [m.name for m in iter_members(introspection, ['function'])]
+assert 'iter_members' in names and names == sorted(names)
+
+info = describe_function(tested.method)
+assert info.defaults == (1,) and info.defining_class is Tested and info.bound_to is tested
+assert describe_function(Tested.helper).signature == '(x, y=2)'
+
+inspect_method(tested.method)
+inspect_function(describe_function)
+
+print('...done\n')
+
+
+print('End of test for module %s.\n' % ( __testTarget__, ))
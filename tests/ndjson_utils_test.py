@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+__title__       = 'This is the test of the NDJSON module.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = 'Testing module.'
+__source__      = 'OSDL (http://osdl.sourceforge.net)'
+__doc__         = __title__ + '\n' + __comments__
+
+__testTarget__  = 'ndjson_utils'
+
+
+import os, json, gzip, tempfile
+
+from ndjson_utils import *
+
+
+print('Beginning test of module %s.\n\n' % ( __testTarget__, ))
+
+test_dir = tempfile.mkdtemp()
+
+records = [{'id': i, 'name': 'message #%s' % (i,), 'score': i / 4, 'urgent': i % 3 == 0} for i in range(1000)]
+
+ndjson_path = os.path.join(test_dir, 'messages.ndjson')
+with open(ndjson_path, 'w') as f:
+    for r in records:
+        f.write(json.dumps(r) + '\n')
+    f.write('\n')
+
+gzip_path = ndjson_path + '.gz'
+with open(ndjson_path, 'rb') as f_in:
+    with gzip.open(gzip_path, 'wb') as f_out:
+        f_out.write(f_in.read())
+
+
+print('Testing conversion to JSON...')
+
+json_path = os.path.join(test_dir, 'messages.json')
+
+for input_path in [ndjson_path, gzip_path]:
+    count = convert_to_json(input_path, json_path)
+    print('  + %s records converted from %s' % (count, os.path.basename(input_path)))
+    with open(json_path) as f:
+        assert json.load(f) == records
+
+print('...done\n')
+
+
+print('Testing parallel conversion...')
+
+if __name__ == '__main__':
+
+    with open(json_path, 'rb') as f:
+        sequential_output = f.read()
+
+    count = convert_to_json(ndjson_path, json_path, jobs=4, chunk_size=1000)
+    print('  + %s records converted in %s chunks' % (count, len(split_into_chunks(ndjson_path, 1000))))
+    with open(json_path, 'rb') as f:
+        assert f.read() == sequential_output
+
+print('...done\n')
+
+
+print('Testing filtering and projection...')
+
+stages = [parse_filter('urgent=true'), parse_filter('name~#1'), parse_projection('id,score')]
+count = convert_to_json(ndjson_path, json_path, stages=stages)
+print('  + %s records selected' % (count,))
+with open(json_path) as f:
+    assert json.load(f) == [{'id': r['id'], 'score': r['score']} for r in records if r['urgent'] and '#1' in r['name']]
+
+assert not stages[0].may_match(b'{"id": 1, "urgent": false}')
+
+# Some producers (ex: Go) escape HTML-sensitive characters:
+escaped_filter = parse_filter('text~a<b')
+escaped_line = b'{"text": "a\\u003cb"}'
+assert escaped_filter.may_match(escaped_line)
+assert escaped_filter.apply(json.loads(escaped_line)) is not None
+
+print('...done\n')
+
+
+print('Testing columnar export...')
+
+column_dir = os.path.join(test_dir, 'columns')
+
+count = export_columns(ndjson_path, column_dir)
+print('  + %s records exported as: %s' % (count, [(c['name'], c['type']) for c in load_schema(column_dir)['columns']]))
+
+scores = load_column(column_dir, 'score')
+assert [float(v) for v in scores] == [r['score'] for r in records]
+names = load_column(column_dir, 'name')
+assert names[12] == records[12]['name']
+assert list(load_validity(column_dir, 'urgent')) == [1] * len(records)
+
+# Fields absent from the sample are reported, even in records having no more
+# fields than the sampled ones:
+mixed_path = os.path.join(test_dir, 'mixed.ndjson')
+with open(mixed_path, 'w') as f:
+    for r in [{'a': 1, 'b': 2, 'c': 3}, {'a': 4, 'd': 5}]:
+        f.write(json.dumps(r) + '\n')
+
+export_columns(mixed_path, os.path.join(test_dir, 'mixed-columns'), sample_size=1)
+assert load_schema(os.path.join(test_dir, 'mixed-columns'))['ignored_fields'] == ['d']
+
+print('...done\n')
+
+
+print('Testing line index...')
+
+count = build_line_index(ndjson_path)
+print('  + %s records indexed' % (count,))
+
+with open_index(ndjson_path) as index:
+    assert len(index) == len(records)
+    assert index.get_record(0) == records[0]
+    assert index.get_record(-1) == records[-1]
+    assert index.get_records(500, 510) == records[500:510]
+
+print('...done\n')
+
+
+print('Testing conversion checkpoints...')
+
+checkpoint_path = os.path.join(test_dir, 'conversion.checkpoint')
+
+# Simulates an interrupted conversion, whose output got partially written:
+class Interruption(Exception):
+    pass
+
+class InterruptingFilter(RecordFilter):
+    def apply(self, record):
+        if record['id'] == 650:
+            raise Interruption()
+        return record
+
+try:
+    convert_to_json(ndjson_path, json_path, stages=[InterruptingFilter('id', '!=', None)], checkpoint_path=checkpoint_path, checkpoint_interval=100)
+except Interruption:
+    print('  + conversion interrupted after line %s' % (json.load(open(checkpoint_path))['line_number'],))
+
+count = convert_to_json(ndjson_path, json_path, checkpoint_path=checkpoint_path, checkpoint_interval=100)
+with open(json_path) as f:
+    assert json.load(f) == records
+assert not os.path.exists(checkpoint_path)
+
+print('...done\n')
+
+
+import shutil
+shutil.rmtree(test_dir)
+
+print('End of test for module %s.\n' % ( __testTarget__, ))
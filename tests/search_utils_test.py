@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+__title__       = 'This is the test of the search module.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = 'Testing module.'
+__source__      = 'OSDL (http://osdl.sourceforge.net)'
+__doc__         = __title__ + '\n' + __comments__
+
+__testTarget__  = 'search_utils'
+
+
+import os, time, shutil, tempfile
+
+from search_utils import *
+
+
+print('Beginning test of module %s.\n\n' % ( __testTarget__, ))
+
+test_dir = tempfile.mkdtemp()
+
+
+def write_file(rel_path, content):
+    path = os.path.join(test_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+    return path
+
+
+main_path = write_file('main.py', 'import os.path\nfrom pkg import helper\n\n\ndef run():\n    helper.compute(1)\n    return os.path.join("a", "b")\n')
+helper_path = write_file('pkg/helper.py', 'class Helper:\n    pass\n\n\ndef compute(x):\n    # compute twice\n    return compute_twice(x)\n')
+write_file('.git/hooks/hook.py', 'def compute():\n    pass\n')
+write_file('venv/lib/module.py', 'def compute():\n    pass\n')
+write_file('env/pyvenv.cfg', 'home = /usr/bin\n')
+write_file('env/lib/module.py', 'def compute():\n    pass\n')
+write_file('notes.txt', 'def compute():\n')
+
+
+print('Testing the listing of files...')
+
+assert list(iter_python_files(test_dir)) == [main_path, helper_path]
+
+print('...done\n')
+
+
+print('Testing the searching of data...')
+
+regex = compile_expression('compute')
+assert search_data(b'compute()\nfoo\n\nbar compute compute\n', regex) == [(1, b'compute()'), (4, b'bar compute compute')]
+assert search_data(b'foo\nbar', regex) == []
+assert search_data(b'foo\ncompute', regex, filenames_only=True) == [(0, b'')]
+assert search_data(b'foo', regex, filenames_only=True) == []
+
+results = list(search('compute', test_dir, jobs=1))
+assert [p for (p, matches) in results] == [main_path, helper_path]
+assert results[1][1] == [(5, b'def compute(x):'), (6, b'    # compute twice'), (7, b'    return compute_twice(x)')]
+
+results = list(search('compute', test_dir, filenames_only=True, jobs=1))
+assert results == [(main_path, [(0, b'')]), (helper_path, [(0, b'')])]
+
+print('...done\n')
+
+
+print('Testing the trigram index...')
+
+index_path = os.path.join(test_dir, 'index', 'trigrams.db')
+
+paths = [os.path.abspath(p) for p in iter_python_files(test_dir)]
+
+with TrigramIndex(index_path) as index:
+    assert index.update(paths) == 2
+    assert index.update(paths) == 0
+    assert index.get_candidates('compute_twice') == set([os.path.abspath(helper_path)])
+    assert index.get_candidates('Compute_Twice', insensitive=True) == set([os.path.abspath(helper_path)])
+    assert index.get_candidates('.*') is None
+
+# Ensures that the modification is detected even with a coarse clock:
+time.sleep(0.01)
+write_file('pkg/helper.py', 'def other(x):\n    return x\n')
+os.utime(helper_path, ns=(time.time_ns(), time.time_ns() + 1000000))
+
+with TrigramIndex(index_path) as index:
+    assert index.update(paths) == 1
+    assert index.get_candidates('compute_twice') == set()
+    assert index.get_candidates('other') == set([os.path.abspath(helper_path)])
+
+assert list(search('compute_twice', test_dir, jobs=1, index_path=index_path)) == []
+
+print('...done\n')
+
+
+print('Testing the structural search...')
+
+write_file('pkg/helper.py', 'class Helper:\n    pass\n\n\ndef compute(x):\n    return compute_twice(x)\n')
+
+symbol_path = os.path.join(test_dir, 'index', 'symbols.db')
+
+with SymbolIndex(symbol_path) as index:
+    assert index.update(paths) == 2
+    assert index.find('def', 'compute') == { os.path.abspath(helper_path): [5] }
+    assert index.find('def', 'Helper') == { os.path.abspath(helper_path): [1] }
+    assert index.find('call', 'compute') == { os.path.abspath(main_path): [6] }
+    assert index.find('call', 'helper.compute') == { os.path.abspath(main_path): [6] }
+    assert index.find('call', 'join') == { os.path.abspath(main_path): [7] }
+    assert index.find('import', 'os') == { os.path.abspath(main_path): [1] }
+    assert index.find('import', 'pkg') == { os.path.abspath(main_path): [2] }
+    assert index.find('import', 'pkg.helper') == { os.path.abspath(main_path): [2] }
+    assert index.find('import', 'pk') == {}
+
+# Same results without index:
+assert list(search_structure('def', 'compute', test_dir, jobs=1)) == [(helper_path, [(5, b'def compute(x):')])]
+assert list(search_structure('def', 'compute', test_dir, jobs=1, index_path=symbol_path)) == [(helper_path, [(5, b'def compute(x):')])]
+
+print('...done\n')
+
+
+shutil.rmtree(test_dir)
+
+print('End of test for module %s.\n' % ( __testTarget__, ))
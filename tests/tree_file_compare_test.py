@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+__title__       = 'This is the test of the tree comparison module.'
+__version__     = '0.1'
+__author__      = 'Olivier Boudeville (olivier.boudeville@online.fr)'
+__project__     = 'Ceylan'
+__creationDate__= '2026, October 19'
+__comments__    = 'Testing module.'
+__source__      = 'OSDL (http://osdl.sourceforge.net)'
+__doc__         = __title__ + '\n' + __comments__
+
+__testTarget__  = 'tree_file_compare'
+
+
+import os, io, tempfile
+
+import tree_file_compare
+from tree_file_compare import *
+
+
+print('Beginning test of module %s.\n\n' % ( __testTarget__, ))
+
+# Outputs are otherwise written to a log file:
+tree_file_compare.log_file = io.StringIO()
+
+
+def make_tree(base_dir, files):
+    for (rel_path, content) in files.items():
+        full_path = os.path.join(base_dir, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+
+
+test_dir = tempfile.mkdtemp()
+
+ref_dir = os.path.join(test_dir, 'ref')
+mirror_dir = os.path.join(test_dir, 'mirror')
+
+common_files = { 'a.txt': 'a', 'same/b.txt': 'b', 'same/deep/c.txt': 'c' }
+
+make_tree(ref_dir, dict(common_files, **{ 'changed/d.txt': 'd', 'only-ref.txt': 'r' }))
+make_tree(mirror_dir, dict(common_files, **{ 'changed/d.txt': 'D', 'changed/e.txt': 'e' }))
+
+
+print('Testing Merkle indexes...')
+
+(ref_content_index, ref_name_index, ref_dir_index) = build_merkle_index_for(ref_dir)
+(mirror_content_index, mirror_name_index, mirror_dir_index) = build_merkle_index_for(mirror_dir)
+
+assert sorted(ref_dir_index.keys()) == ['.', 'changed', 'same', os.path.join('same', 'deep')]
+
+# Identical subtrees have the same digest, differing ones do not:
+assert ref_dir_index['same'][0] == mirror_dir_index['same'][0]
+assert ref_dir_index['changed'][0] != mirror_dir_index['changed'][0]
+assert ref_dir_index['.'][0] != mirror_dir_index['.'][0]
+
+print('...done\n')
+
+
+print('Testing Merkle comparison...')
+
+assert compare_merkle_trees(ref_dir_index, ref_dir_index) == 0
+
+# only-ref.txt, changed/d.txt and changed/e.txt:
+assert compare_merkle_trees(ref_dir_index, mirror_dir_index) == 3
+
+log = io.StringIO()
+write_directory_digests(log, ref_dir_index)
+assert ref_dir_index['same'][0] in log.getvalue()
+
+print('...done\n')
+
+
+print('End of test for module %s.\n' % ( __testTarget__, ))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
 # Imports standard python modules:
-import os, os.path, sys, string, shutil, tempfile, file_utils, time
+import os, os.path, sys, string, shutil, tempfile, file_utils, time, hashlib
 
 # Note: mostly superseded by:
 # https://github.com/Olivier-Boudeville/Ceylan-Myriad/tree/master/src/apps/merge-tool
@@ -40,6 +40,10 @@ Options:
 # full relative paths of the files having that md5 code.
 #
 # Thus duplicates in a given tree can be easily found.
+#
+# When comparing by content, each directory is also given a Merkle digest,
+# computed from the names and digests of its children, so that identical
+# subtrees of the reference and of the mirror can be skipped as a whole.
 
 
 #### Beginning of top-level code. ####
@@ -99,6 +103,71 @@ def build_file_index_for(path):
 
 
 
+def build_merkle_index_for(path):
+    """
+    Creates three (dictionary-based) file indexes for specified path: the
+    content and name ones (as build_file_index_for), and a directory one.
+
+    dir_dic: keys are the paths of directories relative to the specified one
+    ('.' for that root), values are (digest, entries) pairs, where digest is
+    the Merkle digest of the directory and entries is a dictionary whose keys
+    are the names of its children and whose values are (digest, is_dir)
+    pairs.
+
+    The digest of a directory is computed from the names and digests of its
+    children, so two directories having the same digest hold the same tree.
+    """
+
+    content_dic = {}
+    name_dic = {}
+    dir_dic = {}
+
+    # Bottom-up walk, so that subdirectories are digested before their parent:
+    for (dir_path, dir_names, file_names) in os.walk(path, topdown=False):
+
+        rel_dir = os.path.relpath(dir_path, path)
+
+        entries = {}
+
+        for d in dir_names:
+            child = os.path.normpath(os.path.join(rel_dir, d))
+            # Symbolic links to directories are not walked:
+            if child in dir_dic:
+                entries[d] = (dir_dic[child][0], True)
+
+        for n in file_names:
+
+            full_path = os.path.join(dir_path, n)
+
+            if not os.path.isfile(full_path):
+                continue
+
+            f = os.path.join(path, os.path.normpath(os.path.join(rel_dir, n)))
+
+            md5 = file_utils.get_md5_for(full_path)
+            entries[n] = (md5, False)
+
+            if md5 in content_dic:
+                content_dic[md5] += [f]
+            else:
+                content_dic[md5] = [f]
+
+            if n in name_dic:
+                name_dic[n] += [f]
+            else:
+                name_dic[n] = [f]
+
+        digest = hashlib.md5()
+        for name in sorted(entries.keys()):
+            (child_digest, is_dir) = entries[name]
+            digest.update(("%s %s %s\n" % (is_dir and 'd' or 'f', name, child_digest)).encode('utf-8', 'surrogateescape'))
+
+        dir_dic[rel_dir] = (digest.hexdigest(), entries)
+
+    return (content_dic, name_dic, dir_dic)
+
+
+
 def build_name_index_for(path):
     """Creates one (dictionary-based) name index for specified path."""
 
@@ -126,7 +195,7 @@ def build_name_index_for(path):
 
 
 
-def display_content_duplicates(root_path, ontent_index):
+def display_content_duplicates(root_path, content_index):
     """Displays the duplicates in specified content file index."""
     output("Displaying duplicated content in tree %s:" % (root_path,))
     for k in content_index.keys():
@@ -184,6 +253,67 @@ def compare_name_trees(ref_name_index, mirror_name_index):
 
 
 
+def compare_merkle_trees(ref_dir_index, mirror_dir_index):
+    """
+    Compares the reference and mirror trees, based on their directory indexes
+    (see build_merkle_index_for): directories having the same digest on both
+    sides are skipped as a whole, so that only the differing subtrees are
+    walked. Returns the number of differences found.
+    """
+    output("Comparing reference tree with mirror tree, directory-wise:")
+
+    diff_count = 0
+
+    if ref_dir_index['.'][0] == mirror_dir_index['.'][0]:
+        output("  (both trees are identical)")
+        output("")
+        return diff_count
+
+    # Relative paths of the directories that exist, and differ, on both sides:
+    to_visit = ['.']
+
+    while to_visit:
+
+        rel_dir = to_visit.pop()
+
+        ref_entries = ref_dir_index[rel_dir][1]
+        mirror_entries = mirror_dir_index[rel_dir][1]
+
+        for name in sorted(set(ref_entries.keys()) | set(mirror_entries.keys())):
+
+            rel_path = os.path.normpath(os.path.join(rel_dir, name))
+
+            if not name in mirror_entries:
+                output("  + %s is in reference but not in mirror." % (rel_path,))
+                diff_count += 1
+                continue
+
+            if not name in ref_entries:
+                output("  + %s is in mirror but not in reference." % (rel_path,))
+                diff_count += 1
+                continue
+
+            (ref_digest, ref_is_dir) = ref_entries[name]
+            (mirror_digest, mirror_is_dir) = mirror_entries[name]
+
+            if ref_digest == mirror_digest and ref_is_dir == mirror_is_dir:
+                continue
+
+            if ref_is_dir and mirror_is_dir:
+                to_visit.append(rel_path)
+            elif ref_is_dir != mirror_is_dir:
+                output("  + %s is a directory on one side and a file on the other." % (rel_path,))
+                diff_count += 1
+            else:
+                output("  + %s has different contents in reference and in mirror." % (rel_path,))
+                diff_count += 1
+
+    output("")
+
+    return diff_count
+
+
+
 def check_content_completeness(ref_content_index, mirror_content_index):
     """Checks that all content of mirror tree is in reference tree, preferably with the same filenames."""
     output("Checking completeness of reference regarding the mirror:")
@@ -261,6 +391,16 @@ def write_hashes(log_file, content_index):
 
 
 
+def write_directory_digests(log_file, dir_index):
+    """Writes the Merkle digests of the directories in specified directory
+    index (see build_merkle_index_for) in specified log file."""
+    log_file.write("Directory digests:\n\n")
+    for rel_dir in sorted(dir_index.keys()):
+        log_file.write("  %s %s\n" % (dir_index[rel_dir][0], rel_dir))
+    log_file.write("\n")
+
+
+
 if __name__ == '__main__':
 
     help_options = ['-h', '--help']
@@ -374,11 +514,12 @@ if __name__ == '__main__':
 
         else:
             if compare_by_content:
-                (ref_content_index, ref_name_index) = build_file_index_for(reference_path)
+                (ref_content_index, ref_name_index, ref_dir_index) = build_merkle_index_for(reference_path)
                 log_file.write("\n\n ***** For reference tree %s *****\n\n" % (reference_path,))
                 display_content_duplicates(reference_path, ref_content_index)
                 display_name_duplicates(reference_path, ref_name_index)
                 write_hashes(log_file, ref_content_index)
+                write_directory_digests(log_file, ref_dir_index)
             else:
                 ref_name_index = build_name_index_for( reference_path )
                 log_file.write("\n\n ***** For reference tree %s *****\n\n" % (reference_path,))
@@ -388,12 +529,14 @@ if __name__ == '__main__':
                 log_file.write("\n\n ***** For mirror tree %s *****\n\n" % (mirror_path,))
                 print("Scanning mirror tree...")
                 if compare_by_content:
-                    (mirror_content_index, mirror_name_index) = build_file_index_for(mirror_path)
+                    (mirror_content_index, mirror_name_index, mirror_dir_index) = build_merkle_index_for(mirror_path)
                     display_content_duplicates(mirror_path, mirror_content_index)
                     display_name_duplicates(mirror_path, mirror_name_index)
                     write_hashes(log_file, mirror_content_index)
-                    compare_content_trees(ref_content_index, mirror_content_index)
-                    check_content_completeness( ef_content_index, mirror_content_index )
+                    write_directory_digests(log_file, mirror_dir_index)
+                    # Identical subtrees are pruned, based on their digest:
+                    if compare_merkle_trees(ref_dir_index, mirror_dir_index):
+                        check_content_completeness(ref_content_index, mirror_content_index)
                 else:
                     mirror_name_index = build_name_index_for(mirror_path)
                     display_name_duplicates(mirror_path, mirror_name_index)